@@ -1,29 +1,99 @@
 import heapq
 import math
 
+import numpy as np
 from typing import List, Tuple
 
-import constants as c
 from map_tile import Tile
 
 
+# The cost styles the path finding can use. Each one is a function that takes a Map and returns the cost of every tile
+# at once as a flat array in the y * width + x order of the map's PathGrid. New styles are added with @cost_function.
+COST_FUNCTIONS = {}
+
+# The algorithms where every tile costs the same. They don't need a cost map, so path_2d can use them before a map has
+# its PathGrid or after it is unloaded.
+FLAT_COSTS = {"base": 1}
+
+
+def cost_function(algorithm):
+    """
+    Register a function as the cost style of an algorithm.
+    :param algorithm: the name of the algorithm.
+    """
+    def register(function):
+        COST_FUNCTIONS[algorithm] = function
+        return function
+    return register
+
+
+@cost_function("base")
+def base_cost(tile_map) -> np.ndarray:
+    # Every tile costs the same.
+    return np.full(tile_map.path_grid.size, FLAT_COSTS["base"], np.int64)
+
+
+@cost_function("target_player")
+def target_player_cost(tile_map) -> np.ndarray:
+    """
+    This is so the Ai can sneak around the player. It avoids being seen by the player, and avoids it when possible.
+    While still staying as close to the player as possible.
+    """
+    path_grid = tile_map.path_grid
+    player = tile_map.game_view.player
+
+    # How close each tile is to the player. The tiles the player can reach use the real distance, the rest use the
+    # straight line distance.
+    x, y = np.meshgrid(np.arange(path_grid.width), np.arange(path_grid.height))
+    closeness = np.sqrt((x - player.e_x)**2 + (y - player.e_y)**2).astype(np.int64).ravel()
+    if player.path_finding_data is not None:
+        distances = player.path_finding_data[1]
+        closeness[[path_grid.index(tile.location) for tile in distances]] = list(distances.values())
+
+    return closeness + seen_map(tile_map)
+
+
+def seen_map(tile_map) -> np.ndarray:
+    """
+    How much the player can see each tile, 255 if they can see it and 0 if they can't.
+    :param tile_map: The Map to find the vision of.
+    :return: the vision as a flat array in the y * width + x order of the map's PathGrid.
+    """
+    return tile_map.vision_handler.visible_mask().ravel() * np.uint8(255)
+
+
+def cost_map(tile_map, algorithm) -> np.ndarray:
+    """
+    Find the cost of every tile on a map. The costs are only found again when the map, the player, or the player's
+    vision changes.
+    :param tile_map: The Map to find the costs of.
+    :param algorithm: What style to find the cost for.
+    :return: the costs as a flat array in the y * width + x order of the map's PathGrid.
+    """
+    if algorithm in FLAT_COSTS:
+        # Only the size of the map matters, not the player or their vision.
+        key = (tile_map.revision, tile_map.path_grid.size)
+    else:
+        player = tile_map.game_view.player
+        key = (tile_map.revision, tile_map.vision_handler.revision,
+               player.e_x, player.e_y, player.action_handler.initiative)
+    cached = tile_map.cost_maps.get(algorithm)
+    if cached is None or cached[0] != key:
+        cached = key, COST_FUNCTIONS[algorithm](tile_map)
+        tile_map.cost_maps[algorithm] = cached
+    return cached[1]
+
+
 def find_cost(tile, algorithm) -> int:
     """
-    using the input algorithm find the cost of a tile. This is so the Ai can sneak around the player. It avoids being
-    seen by the player, and avoids it when possible. While still staying as close to the player as possible.
+    using the input algorithm find the cost of a tile.
     :param tile: The Current Tile To find cost.
     :param algorithm: What style to find the cost for.
     :return: the cost.
     """
-    if algorithm == "base":
-        return 1
-    elif algorithm == "target_player":
-        if tile in c.PLAYER.path_finding_data[1]:
-            closeness = c.PLAYER.path_finding_data[1][tile]
-        else:
-            closeness = int(math.sqrt(astar_heuristic(tile.location, (c.PLAYER.e_x, c.PLAYER.e_y))))
-        seen = tile.map.vision_handler.vision_image.getpixel(tile.location)[0]
-        return closeness + seen
+    if algorithm in FLAT_COSTS:
+        return FLAT_COSTS[algorithm]
+    return int(cost_map(tile.map, algorithm)[tile.map.path_grid.index(tile.location)])
 
 
 class PriorityQueue:
@@ -42,6 +112,10 @@ class PriorityQueue:
     def get(self):
         return heapq.heappop(self.elements)[1]
 
+    def pop(self):
+        # get but with the priority as well.
+        return heapq.heappop(self.elements)
+
 
 def find_neighbours(tile_map):
     """
@@ -50,8 +124,8 @@ def find_neighbours(tile_map):
     :param tile_map: The 2d array of tiles to go through.
     """
     # It only looks backwards so that it doesn't ever do the same operation twice while still finding the neighbors for
-    # every tile.
-    dirs = (0, -1), (-1, 0)
+    # every tile. Each direction has its index in c.DIRECTIONS.
+    dirs = ((0, -1), 2), ((-1, 0), 3)
 
     # Iterate through tile map.
     for x_dex, column in enumerate(tile_map):
@@ -60,7 +134,7 @@ def find_neighbours(tile_map):
             # If the tile isn't none check each direction.
             if current_tile is not None:
                 current_tile.location = (x_dex, y_dex)
-                for direction in dirs:
+                for direction, cur_neigh_dir in dirs:
 
                     # Find the x and y pos of the neighbor tile.
                     n_x = x_dex + direction[0]
@@ -70,7 +144,6 @@ def find_neighbours(tile_map):
                     if 0 <= n_y < len(column) and 0 <= n_x < len(tile_map):
                         # find the neighbor and the direction index to the tile and from the tile.
                         neighbor_tile = tile_map[n_x, n_y]
-                        cur_neigh_dir = c.DIRECTIONS[direction]
                         neigh_cur_dir = (cur_neigh_dir + 2) % 4
 
                         # if both tiles aren't none set the tiles to be neighbors.
@@ -79,6 +152,293 @@ def find_neighbours(tile_map):
                             current_tile.neighbours[cur_neigh_dir] = neighbor_tile
 
 
+def find_mask(directions, walkable):
+    """
+    Compile the movement mask of a block of tiles, see PathGrid.
+    :param directions: the open directions of each tile as bits, indexed [y, x].
+    :param walkable: whether each tile can be moved onto, indexed [y, x].
+    :return: the mask of each tile, indexed [y, x]. The tiles on the edge of the block are only right if the block
+    is the whole map.
+    """
+    mask = np.zeros(directions.shape, np.uint8)
+
+    # For each direction compare the tiles with their neighbour, the opposite direction is (index + 2) % 4.
+    # 0: +y, 1: +x, 2: -y, 3: -x
+    mask[:-1, :] |= ((directions[:-1, :] & 1) & (directions[1:, :] >> 2) & walkable[1:, :]).astype(np.uint8)
+    mask[:, :-1] |= ((directions[:, :-1] >> 1 & 1) & (directions[:, 1:] >> 3) & walkable[:, 1:]) << 1
+    mask[1:, :] |= ((directions[1:, :] >> 2 & 1) & directions[:-1, :] & walkable[:-1, :]) << 2
+    mask[:, 1:] |= ((directions[:, 1:] >> 3 & 1) & (directions[:, :-1] >> 1) & walkable[:, :-1]) << 3
+    return mask
+
+
+def find_reverse(mask):
+    """
+    Compile the reverse mask of a block of tiles from its mask, see PathGrid.
+    """
+    # The neighbour in direction i has to be open in the opposite direction, (i + 2) % 4.
+    reverse = np.zeros_like(mask)
+    reverse[:-1, :] |= mask[1:, :] >> 2 & 1
+    reverse[:, :-1] |= (mask[:, 1:] >> 3 & 1) << 1
+    reverse[1:, :] |= (mask[:-1, :] & 1) << 2
+    reverse[:, 1:] |= (mask[:, :-1] >> 1 & 1) << 3
+    return reverse
+
+
+class PathGrid:
+    """
+    A flat array copy of a map's tile grid for the array pathfinding engine. Every tile is stored at the index
+    y * width + x, and the connections between tiles are compiled into a single bitmask per tile so a search never has
+    to look at the Tile objects themselves.
+
+    bit i of the mask is set if an actor can move from the tile to its neighbour in direction i. This means both tiles
+    have to be open in that direction, and the neighbour has to have the 'move' action.
+
+    The searches walk the movement graph compiled from the mask in compressed sparse row form, with a fixed row of four
+    slots for every tile. The tiles tile i can move onto are adjacency[4 * i:adjacency_end[i]], so a search never checks
+    a direction that is closed, and a changed tile only writes its own row. The reverse graph is the same but holds the
+    tiles that can move onto tile i.
+    """
+
+    # How many of the latest changes are kept. Anything further behind than that has to be built again from scratch.
+    MAX_CHANGES = 256
+
+    def __init__(self, tile_map):
+        self.width, self.height = tile_map.shape
+        self.size = self.width * self.height
+
+        # tile_map is indexed [x, y] so the transpose is needed to get the y * width + x order.
+        self.tiles = np.empty(self.size, object)
+        self.tiles[:] = tile_map.T.ravel()
+
+        # The open directions of each tile as bits, whether the tile can be moved onto, and the compiled mask.
+        self.directions = np.zeros(self.size, np.uint8)
+        self.walkable = np.zeros(self.size, bool)
+        self.mask = np.zeros(self.size, np.uint8)
+
+        # How far to move in the flat array to get to the neighbour in each direction. Ordered like c.DIRECTIONS.
+        self.offsets = (self.width, 1, -self.width, -1)
+
+        # bit i of the reverse mask is set if the neighbour in direction i can move onto the tile.
+        self.reverse_mask = np.zeros(self.size, np.uint8)
+
+        # The movement graph and the reverse graph.
+        self.adjacency_end = np.zeros(self.size, np.int64)
+        self.adjacency = np.full(self.size * 4, -1, np.int32)
+        self.reverse_end = np.zeros(self.size, np.int64)
+        self.reverse_adjacency = np.full(self.size * 4, -1, np.int32)
+
+        # Python list copies of the graphs, which are much quicker to read one tile at a time. Made when first needed
+        # and kept in step with the arrays after that.
+        self.graphs = {}
+
+        # The tiles of the latest changes, and how many changes there have been. Incremental searches use these to
+        # find what they need to repair, see changed_since.
+        self.changes: List[int] = []
+        self.version = 0
+
+        for index in np.flatnonzero(np.not_equal(self.tiles, None)):
+            self.read_tile(index)
+        self.build_mask()
+
+    def index(self, xy) -> int:
+        return xy[1] * self.width + xy[0]
+
+    def location(self, index) -> Tuple[int, int]:
+        return index % self.width, index // self.width
+
+    def changed_since(self, version):
+        """
+        :param version: the version of the grid something is up to date with.
+        :return: the set of tiles that have changed since then, or None if those changes are too old to be kept.
+        """
+        oldest = self.version - len(self.changes)
+        if version < oldest:
+            return None
+        return set(self.changes[version - oldest:])
+
+    def read_tile(self, index):
+        """
+        Copy the directions and move availability of one tile into the arrays.
+        :param index: the flat index of the tile.
+        """
+        tile = self.tiles[index]
+        if tile is None:
+            self.directions[index] = 0
+            self.walkable[index] = False
+        else:
+            self.directions[index] = sum(1 << dir_dex for dir_dex, open_dir in enumerate(tile.directions) if open_dir)
+            self.walkable[index] = 'move' in tile.available_actions
+
+    def build_mask(self):
+        """
+        Compile the whole movement mask at once.
+        """
+        grid = (self.height, self.width)
+        mask = find_mask(self.directions.reshape(grid), self.walkable.reshape(grid))
+        self.mask = mask.ravel()
+        self.reverse_mask = find_reverse(mask).ravel()
+        self.build_adjacency()
+
+    def find_rows(self, bits):
+        """
+        Turn the mask bits of every tile into rows of the graph. The row of tile i starts at 4 * i so there is room for
+        all four neighbours, and the connected ones are packed to the front in the order of c.DIRECTIONS.
+        :param bits: the mask or reverse mask of each tile.
+        :return: the end of each row, and the neighbours with the unused slots left as -1.
+        """
+        connected = (bits[:, None] >> np.arange(4, dtype=np.uint8) & 1).astype(bool)
+        indexes = np.arange(len(bits))
+        order = np.argsort(~connected, axis=1, kind='stable')
+        neighbours = np.take_along_axis(indexes[:, None] + np.array(self.offsets), order, axis=1)
+        neighbours = np.where(np.take_along_axis(connected, order, axis=1), neighbours, -1)
+        return indexes * 4 + connected.sum(axis=1), neighbours.ravel().astype(np.int32)
+
+    def build_adjacency(self):
+        """
+        Compile both graphs from the whole mask at once.
+        """
+        self.adjacency_end, self.adjacency = self.find_rows(self.mask)
+        self.reverse_end, self.reverse_adjacency = self.find_rows(self.reverse_mask)
+        self.graphs = {}
+
+    def patch_rows(self, bits, indexes, reverse=False):
+        """
+        Write the rows of some tiles in a graph again. Every row has a fixed place, so nothing else is touched, and the
+        list copies made by graph are patched the same way.
+        :param bits: the mask the graph is made from.
+        :param indexes: the tiles to write again.
+        :param reverse: patch the reverse graph instead.
+        """
+        if reverse:
+            graphs = [(self.reverse_end, self.reverse_adjacency)]
+        else:
+            graphs = [(self.adjacency_end, self.adjacency)]
+        if reverse in self.graphs:
+            graphs.append(self.graphs[reverse])
+
+        for index in indexes:
+            index, tile_bits = int(index), int(bits[index])
+            row = [index + offset for dir_dex, offset in enumerate(self.offsets) if tile_bits >> dir_dex & 1]
+            for ends, adjacency in graphs:
+                adjacency[4 * index:4 * index + len(row)] = row
+                ends[index] = 4 * index + len(row)
+
+    def graph(self, reverse=False):
+        """
+        The list copies of a graph for the search loops. They are made once, and patched when a tile changes.
+        :param reverse: get the reverse graph instead.
+        :return: the end of each row and the neighbours, as lists. The row of tile i is neighbours[4 * i:ends[i]].
+        """
+        graph = self.graphs.get(reverse)
+        if graph is None:
+            if reverse:
+                graph = self.reverse_end.tolist(), self.reverse_adjacency.tolist()
+            else:
+                graph = self.adjacency_end.tolist(), self.adjacency.tolist()
+            self.graphs[reverse] = graph
+        return graph
+
+    def neighbour(self, index, dir_dex):
+        """
+        Find the flat index of the neighbour in a direction. Returns -1 if it is outside of the map.
+        """
+        x, y = self.location(index)
+        n_x, n_y = x + (dir_dex == 1) - (dir_dex == 3), y + (dir_dex == 0) - (dir_dex == 2)
+        if 0 <= n_x < self.width and 0 <= n_y < self.height:
+            return n_y * self.width + n_x
+        return -1
+
+    def build_tile_mask(self, index):
+        """
+        Compile the movement mask of a single tile.
+        """
+        bits = 0
+        for dir_dex in range(4):
+            neighbour = self.neighbour(index, dir_dex)
+            if (neighbour >= 0 and self.directions[index] >> dir_dex & 1 and
+                    self.directions[neighbour] >> ((dir_dex + 2) % 4) & 1 and self.walkable[neighbour]):
+                bits |= 1 << dir_dex
+        self.mask[index] = bits
+
+    def build_tile_reverse(self, index):
+        """
+        Compile the reverse mask of a single tile.
+        """
+        bits = 0
+        for dir_dex in range(4):
+            neighbour = self.neighbour(index, dir_dex)
+            if neighbour >= 0 and self.mask[neighbour] >> ((dir_dex + 2) % 4) & 1:
+                bits |= 1 << dir_dex
+        self.reverse_mask[index] = bits
+
+    def update_tile(self, tile):
+        """
+        When a tile changes only it and its four neighbours need their masks rebuilt. Their neighbours' reverse masks
+        can change as well, so those rows of the reverse graph are patched too.
+        :param tile: the changed tile.
+        """
+        index = self.index(tile.location)
+        self.read_tile(index)
+
+        near = [index] + [neighbour for neighbour in (self.neighbour(index, dir_dex) for dir_dex in range(4))
+                          if neighbour >= 0]
+        for neighbour in near:
+            self.build_tile_mask(neighbour)
+
+        reverse_near = set(near)
+        for neighbour in near:
+            reverse_near.update(other for other in (self.neighbour(neighbour, dir_dex) for dir_dex in range(4))
+                                if other >= 0)
+        for neighbour in reverse_near:
+            self.build_tile_reverse(neighbour)
+
+        self.patch_rows(self.mask, near)
+        self.patch_rows(self.reverse_mask, reverse_near, reverse=True)
+
+        self.add_changes([index])
+
+    def update_region(self, x, y, width, height):
+        """
+        Like update_tile for a whole block of tiles at once, after their directions and walkable have been written
+        straight into the arrays. Used by the streaming world when a chunk is loaded or unloaded.
+        :param x: the x of the corner of the block.
+        :param y: the y of the corner of the block.
+        :param width: the width of the block.
+        :param height: the height of the block.
+        """
+        # The masks change up to one tile outside the block, and the reverse masks up to two. Each is found from a
+        # box one tile bigger again, as the tiles on the edge of that box are missing their neighbours.
+        grid = (self.height, self.width)
+
+        def box(grow):
+            # The block grown by some tiles and cut to the map, as [y, x] slices.
+            return (slice(max(y - grow, 0), min(y + height + grow, self.height)),
+                    slice(max(x - grow, 0), min(x + width + grow, self.width)))
+
+        def inside(outer, inner):
+            # The inner box as slices of the array cut out by the outer box.
+            return tuple(slice(part.start - whole.start, part.stop - whole.start) for whole, part in zip(outer, inner))
+
+        mask, reverse_mask = self.mask.reshape(grid), self.reverse_mask.reshape(grid)
+        outer, near = box(2), box(1)
+        block = find_mask(self.directions.reshape(grid)[outer], self.walkable.reshape(grid)[outer])
+        mask[near] = block[inside(outer, near)]
+        outer, reverse_near = box(3), box(2)
+        reverse_mask[reverse_near] = find_reverse(mask[outer])[inside(outer, reverse_near)]
+
+        indexes = np.arange(self.size).reshape(grid)
+        self.patch_rows(self.mask, indexes[near].ravel())
+        self.patch_rows(self.reverse_mask, indexes[reverse_near].ravel(), reverse=True)
+        self.add_changes(indexes[box(0)].ravel().tolist())
+
+    def add_changes(self, indexes):
+        # Keep the tiles of the latest changes, one version per tile.
+        self.changes.extend(indexes)
+        self.version += len(indexes)
+        if len(self.changes) > self.MAX_CHANGES:
+            del self.changes[:len(self.changes) - self.MAX_CHANGES // 2]
+
+
 def astar_heuristic(a: tuple = (int, int), b: tuple = (int, int)):
     # Find the non sqrt distance between two tiles. C^2 = A^2 + B^2
     x1, y1 = a
@@ -170,6 +530,355 @@ def path_2d(grid_2d, start_xy, max_dist: int = 20, algorithm="base"):
     return came_from, cost_so_far, edges, tile_costs
 
 
+class PathField:
+    """
+    The raw result of an array search. Only the reached tiles are stored so a field stays small no matter how big the
+    map is. It is turned into the (came_from, cost_so_far, edges, tile_costs) of path_2d only when it is used.
+    """
+    def __init__(self, path_grid: PathGrid, reached, came_from, cost_so_far, tile_costs, max_dist, version):
+        """
+        :param path_grid: The PathGrid the search was run on.
+        :param reached: the flat index of every reached tile, the start is always first.
+        :param came_from: the flat index each reached tile came from, -1 for the start.
+        :param cost_so_far: the initiative cost of each reached tile.
+        :param tile_costs: the cost of each reached tile.
+        :param max_dist: the max_dist of the search.
+        :param version: the version of the PathGrid when the search was run.
+        """
+        self.path_grid = path_grid
+        self.reached = reached
+        self.came_from = came_from
+        self.cost_so_far = cost_so_far
+        self.tile_costs = tile_costs
+        self.max_dist = max_dist
+        self.version = version
+
+        # The dicts are only made once, even if the field is used many times.
+        self.data = None
+
+    def __len__(self):
+        return len(self.reached)
+
+    @property
+    def nbytes(self) -> int:
+        # The arrays plus a rough guess of the dicts and lists made by path_data.
+        return (self.reached.nbytes + self.came_from.nbytes + self.cost_so_far.nbytes + self.tile_costs.nbytes +
+                len(self.reached) * 320)
+
+    def truncate(self, max_dist):
+        """
+        Cut the field down to the tiles within max_dist. This only gives the same field a smaller search would if the
+        priority of every tile is its cost, so only use it with the 'base' algorithm.
+        :param max_dist: the new maximum distance.
+        :return: a new PathField.
+        """
+        keep = self.cost_so_far <= max_dist
+        return PathField(self.path_grid, self.reached[keep], self.came_from[keep], self.cost_so_far[keep],
+                         self.tile_costs[keep], max_dist, self.version)
+
+    def path_data(self):
+        """
+        Turn the field into the (came_from, cost_so_far, edges, tile_costs) of path_2d. The dicts are shared between
+        calls but tile_costs is a new queue each time since it is emptied as it is used.
+        :return: The came_from and cost_so_far dictionaries, costs_loaded and edges.
+        """
+        path_grid = self.path_grid
+        tiles = path_grid.tiles
+        reached = self.reached
+
+        if self.data is None:
+            # A tile is an edge if there is a direction that doesn't lead to another reached tile.
+            reached_mask = np.zeros(path_grid.size, bool)
+            reached_mask[reached] = True
+            connected = np.zeros(len(reached), np.uint8)
+            for dir_dex, offset in enumerate(path_grid.offsets):
+                bit = path_grid.mask[reached] >> dir_dex & 1
+                neighbours = np.where(bit == 1, reached + offset, 0)
+                connected += (bit & reached_mask[neighbours]).astype(np.uint8)
+            edge_indices = np.flatnonzero(connected < 4)
+            edge_indices = edge_indices[np.argsort(self.cost_so_far[edge_indices], kind='stable')]
+
+            reached_tiles = tiles[reached].tolist()
+            came_from = {tile: (tiles[from_index] if from_index >= 0 else None)
+                         for tile, from_index in zip(reached_tiles, self.came_from.tolist())}
+            cost_so_far = dict(zip(reached_tiles, self.cost_so_far.tolist()))
+            edges = [reached_tiles[index] for index in edge_indices.tolist()]
+            costs = list(zip(self.tile_costs.tolist(), reached_tiles))
+            heapq.heapify(costs)
+
+            self.data = came_from, cost_so_far, edges, costs
+
+        came_from, cost_so_far, edges, costs = self.data
+        tile_costs = PriorityQueue()
+        tile_costs.elements = list(costs)
+        return came_from, cost_so_far, edges, tile_costs
+
+
+def path_field(path_grid: PathGrid, start_xy, max_dist: int = 20, algorithm="base") -> PathField:
+    """
+    The same search as path_2d but it is run on the flat arrays of a PathGrid rather than dicts of Tiles.
+
+    :param path_grid: The PathGrid of the map.
+    :param start_xy: The starting x and y position.
+    :param max_dist: The maximum distance a tile can be before it stops processing.
+    :param algorithm: which algorithm to use when calculating the
+    :return: the PathField of the search.
+    """
+    start = path_grid.index(start_xy)
+    tiles = path_grid.tiles
+    adjacency_end, adjacency = path_grid.graph()
+
+    # The arrays that replace the dicts. -1 means that the tile has not been reached.
+    came_from = np.full(path_grid.size, -1, np.int32)
+    cost_so_far = np.full(path_grid.size, -1, np.int32)
+    priority_so_far = np.full(path_grid.size, -1, np.float64)
+
+    costs = cost_map(tiles[start].map, algorithm)
+
+    cost_so_far[start] = 0
+    priority_so_far[start] = 0
+    reached = [start]
+
+    frontier = PriorityQueue()
+    frontier.put(0, start)
+
+    while not frontier.empty():
+        priority, current = frontier.pop()
+
+        # A tile can be in the queue more than once. Only the entry with the lowest priority is used.
+        if priority > priority_so_far[current]:
+            continue
+
+        new_cost = cost_so_far[current] + 1
+        if new_cost > max_dist:
+            continue
+
+        for neighbour in adjacency[4 * current:adjacency_end[current]]:
+            new_priority = priority + costs[neighbour]
+            if cost_so_far[neighbour] < 0 or new_priority < priority_so_far[neighbour]:
+                if cost_so_far[neighbour] < 0:
+                    reached.append(neighbour)
+                cost_so_far[neighbour] = new_cost
+                priority_so_far[neighbour] = new_priority
+                came_from[neighbour] = current
+                frontier.put(new_priority, neighbour)
+
+    reached = np.array(reached, np.int32)
+    return PathField(path_grid, reached, came_from[reached], cost_so_far[reached],
+                     costs[reached].astype(np.float64), max_dist, path_grid.version)
+
+
+class IncrementalPath:
+    """
+    A 'base' search that keeps its state between calls, so when tiles change only the part of the field that depends
+    on them is searched again. It is Lifelong Planning A* without a goal, which makes it an incremental Dijkstra.
+
+    g is the cost of each tile the last time it was settled, and rhs is the best cost its neighbours can give it now.
+    A tile where they differ is inconsistent and is put back in the frontier.
+    """
+    def __init__(self, path_grid: PathGrid, start_xy, max_dist: int = 20):
+        """
+        :param path_grid: The PathGrid of the map.
+        :param start_xy: The starting x and y position.
+        :param max_dist: The maximum distance a tile can be before it stops processing.
+        """
+        self.path_grid = path_grid
+        self.start = path_grid.index(start_xy)
+        self.max_dist = max_dist
+
+        self.g = {}
+        self.rhs = {self.start: 0}
+        self.frontier = PriorityQueue()
+        self.frontier.put(0, self.start)
+
+        # The version of the PathGrid the search is up to date with.
+        self.version = path_grid.version
+
+    @classmethod
+    def from_field(cls, field: PathField):
+        """
+        Start an incremental search from the finished field of a normal 'base' search, so nothing has to be searched
+        until a tile changes.
+        :param field: the PathField to start from.
+        :return: the IncrementalPath
+        """
+        path_grid = field.path_grid
+        search = cls(path_grid, path_grid.location(int(field.reached[0])), field.max_dist)
+        search.g = dict(zip(field.reached.tolist(), field.cost_so_far.tolist()))
+        search.rhs = dict(search.g)
+        search.frontier = PriorityQueue()
+        search.version = field.version
+        return search
+
+    def predecessors(self, index):
+        # The neighbours that can move onto the tile.
+        reverse_end, reverse_adjacency = self.path_grid.graph(reverse=True)
+        return reverse_adjacency[4 * index:reverse_end[index]]
+
+    def successors(self, index):
+        # The neighbours the tile can move onto.
+        adjacency_end, adjacency = self.path_grid.graph()
+        return adjacency[4 * index:adjacency_end[index]]
+
+    def update_vertex(self, index):
+        """
+        Find the new rhs of a tile and put it in the frontier if it is now inconsistent.
+        """
+        if index != self.start:
+            rhs = min((self.g.get(neighbour, math.inf) + 1 for neighbour in self.predecessors(index)),
+                      default=math.inf)
+            if rhs <= self.max_dist:
+                self.rhs[index] = rhs
+            else:
+                self.rhs.pop(index, None)
+
+        g, rhs = self.g.get(index, math.inf), self.rhs.get(index, math.inf)
+        if g != rhs:
+            self.frontier.put(min(g, rhs), index)
+
+    def compute(self, max_dist: int = None) -> PathField:
+        """
+        Repair the search with every tile that has changed since the last call, and return the new field.
+        :param max_dist: The maximum distance of the field. If it is larger than the search's the search grows.
+        :return: the PathField
+        """
+        max_dist = self.max_dist if max_dist is None else max_dist
+
+        if max_dist > self.max_dist:
+            # The tiles at the old max distance were not allowed to reach their neighbours. Now they are.
+            old_max = self.max_dist
+            self.max_dist = max_dist
+            for index in [index for index, g in self.g.items() if g == old_max]:
+                for neighbour in self.successors(index):
+                    self.update_vertex(neighbour)
+
+        # Many changes can build up between calls, like when a conversation opens a lot of doors. They are only
+        # repaired once here. If the search is so far behind the changes are gone, it starts again.
+        changed = self.path_grid.changed_since(self.version)
+        self.version = self.path_grid.version
+        if changed is None:
+            self.g = {}
+            self.rhs = {self.start: 0}
+            self.frontier = PriorityQueue()
+            self.frontier.put(0, self.start)
+            changed = ()
+        for index in changed:
+            self.update_vertex(index)
+            for dir_dex in range(4):
+                neighbour = self.path_grid.neighbour(index, dir_dex)
+                if neighbour >= 0:
+                    self.update_vertex(neighbour)
+
+        while not self.frontier.empty():
+            key, index = heapq.heappop(self.frontier.elements)
+            g, rhs = self.g.get(index, math.inf), self.rhs.get(index, math.inf)
+
+            # Skip the tiles that were put in the frontier more than once, or have since become consistent.
+            if g == rhs or key != min(g, rhs):
+                continue
+
+            if g > rhs:
+                self.g[index] = rhs
+            else:
+                self.g.pop(index)
+                self.update_vertex(index)
+            for neighbour in self.successors(index):
+                self.update_vertex(neighbour)
+
+        return self.field(max_dist)
+
+    def field(self, max_dist) -> PathField:
+        """
+        Make a PathField of the settled tiles within max_dist.
+        """
+        reached = sorted((index for index, g in self.g.items() if g <= max_dist), key=self.g.get)
+        came_from = []
+        for index in reached:
+            g = self.g[index]
+            came_from.append(next((neighbour for neighbour in self.predecessors(index)
+                                   if self.g.get(neighbour, math.inf) == g - 1), -1))
+
+        reached = np.array(reached, np.int32)
+        return PathField(self.path_grid, reached, np.array(came_from, np.int32),
+                         np.array([self.g[index] for index in reached.tolist()], np.int32),
+                         np.ones(len(reached), np.float64), max_dist, self.version)
+
+
+def path_2d_array(path_grid: PathGrid, start_xy, max_dist: int = 20, algorithm="base"):
+    """
+    path_2d run on a PathGrid. The results are turned back into Tiles at the end so it can be used anywhere path_2d is.
+
+    :param path_grid: The PathGrid of the map.
+    :param start_xy: The starting x and y position.
+    :param max_dist: The maximum distance a tile can be before it stops processing.
+    :param algorithm: which algorithm to use when calculating the
+    :return: The came_from and cost_so_far dictionaries, costs_loaded and edges.
+    """
+    return path_field(path_grid, start_xy, max_dist, algorithm).path_data()
+
+
+def find_path(path_grid: PathGrid, start_xy, goal_xy, max_dist: int = 20) -> list:
+    """
+    Find the path to a single tile with A*. This is much faster than path_2d when only one tile matters, as the
+    search heads straight for the goal and stops as soon as it is found. Only for the 'base' algorithm, since the
+    manhattan distance is only a safe guess when every move costs 1.
+
+    :param path_grid: The PathGrid of the map.
+    :param start_xy: The starting x and y position.
+    :param goal_xy: The x and y position to find the path to.
+    :param max_dist: The maximum distance a tile can be before it stops processing.
+    :return: the list of tiles to move through, not including the start. Empty if the goal can't be reached.
+    """
+    start, goal = path_grid.index(start_xy), path_grid.index(goal_xy)
+    goal_x, goal_y = goal_xy
+    width = path_grid.width
+    adjacency_end, adjacency = path_grid.graph()
+
+    def heuristic(index):
+        # The manhattan distance to the goal. It never over estimates so the first path found is the shortest.
+        return abs(index % width - goal_x) + abs(index // width - goal_y)
+
+    start_heuristic = heuristic(start)
+    if start == goal or start_heuristic > max_dist:
+        return []
+
+    came_from = {start: -1}
+    cost_so_far = {start: 0}
+
+    # Sorted by the estimated total cost, then by the heuristic so the tiles closest to the goal go first.
+    frontier = [(start_heuristic, start_heuristic, start)]
+
+    while frontier:
+        priority, current_heuristic, current = heapq.heappop(frontier)
+        if current == goal:
+            break
+
+        # Skip the tiles that have been put in the frontier again with a lower cost.
+        if priority > cost_so_far[current] + current_heuristic:
+            continue
+
+        new_cost = cost_so_far[current] + 1
+
+        for neighbour in adjacency[4 * current:adjacency_end[current]]:
+            if neighbour not in cost_so_far or new_cost < cost_so_far[neighbour]:
+                neighbour_heuristic = heuristic(neighbour)
+                # If even the best case is too far then the tile is never worth looking at.
+                if new_cost + neighbour_heuristic <= max_dist:
+                    cost_so_far[neighbour] = new_cost
+                    came_from[neighbour] = current
+                    heapq.heappush(frontier, (new_cost + neighbour_heuristic, neighbour_heuristic, neighbour))
+    else:
+        return []
+
+    path = []
+    current = goal
+    while current != start:
+        path.append(path_grid.tiles[current])
+        current = came_from[current]
+    path.reverse()
+    return path
+
+
 def reconstruct_path(grid_2d, came_from: dict, start_xy: tuple, end_xy: tuple):
     """
     Taking the start and end pos it reconstructs the path. This is split from generating the Path_2d because multiple
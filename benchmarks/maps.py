@@ -0,0 +1,254 @@
+import json
+import os
+import random
+import xml.etree.ElementTree as ElementTree
+
+import numpy as np
+
+from map_tile import Tile
+from path_cache import PathCache
+
+# The layers that are made into plain tiles when a map is loaded. See Map.load_map in mapdata.py.
+LAYERS = ('floor', 'wall', 'walls', 'decoration')
+
+
+class Layout:
+    """
+    The movement of a map without any Tiles. Indexed [x, y] like Map.tile_map.
+    """
+    def __init__(self, width, height):
+        self.width, self.height = width, height
+
+        # The open directions of each tile ordered like c.DIRECTIONS, whether it can be moved onto, and whether there
+        # is a tile there at all.
+        self.directions = np.ones((width, height, 4), np.uint8)
+        self.walkable = np.zeros((width, height), bool)
+        self.present = np.zeros((width, height), bool)
+
+        # The open directions for line of sight, if they aren't the same as the movement directions. Only some tiles
+        # like the laser gates let the vision through where they don't let actors through.
+        self.vision = None
+
+    def close(self, x, y, dir_dex):
+        """
+        Put a wall between a tile and its neighbour, on both sides.
+        """
+        n_x, n_y = x + (dir_dex == 1) - (dir_dex == 3), y + (dir_dex == 0) - (dir_dex == 2)
+        self.directions[x, y, dir_dex] = 0
+        if self.vision is not None:
+            self.vision[x, y, dir_dex] = 0
+        if 0 <= n_x < self.width and 0 <= n_y < self.height:
+            self.directions[n_x, n_y, (dir_dex + 2) % 4] = 0
+            if self.vision is not None:
+                self.vision[n_x, n_y, (dir_dex + 2) % 4] = 0
+
+    def tiled(self, width, height):
+        """
+        Repeat the layout until it fills a larger map.
+        """
+        layout = Layout(width, height)
+        reps = (-(-width // self.width), -(-height // self.height))
+        layout.directions = np.tile(self.directions, reps + (1,))[:width, :height].copy()
+        layout.walkable = np.tile(self.walkable, reps)[:width, :height].copy()
+        layout.present = np.tile(self.present, reps)[:width, :height].copy()
+        if self.vision is not None:
+            layout.vision = np.tile(self.vision, reps + (1,))[:width, :height].copy()
+        return layout
+
+    def walls(self) -> np.ndarray:
+        """
+        The wall map of the layout in the same layout as VisionCalculator.walls, shape (height, width, 4).
+        """
+        vision = self.directions if self.vision is None else self.vision
+        return (np.where(self.present[:, :, None], vision, 0) * 255).astype(np.uint8).transpose(1, 0, 2).copy()
+
+
+def load_tile_data(location: str = 'tiles.json'):
+    """
+    Read the movement directions and actions of every tile without loading any textures.
+    :return: a dict of tile ids to (directions, actions, relative positions of the pieces, vision directions).
+    """
+    with open(f"data/{location}") as file:
+        files, tiles = json.load(file).values()
+
+    tile_data = {}
+    for index, tile in enumerate(tiles[:-1]):
+        relative = [tuple(piece.get('relative_pos', [0, 0])) for piece in tile['pieces']]
+        directions = tile.get('directions', [1, 1, 1, 1])
+        tile_data[tile.get('id', index+1)] = (directions, tile.get('actions', []), relative,
+                                              tile.get('vision', directions))
+    return tile_data
+
+
+def read_tmx(location: str) -> Layout:
+    """
+    Read the movement of a tmx map without arcade. Doors, gates, and points of interest are left out.
+    :param location: the name of the tmx map.
+    """
+    tile_data = load_tile_data()
+    root = ElementTree.parse(f"tiled/tilemaps/{location}.tmx").getroot()
+    layout = Layout(int(root.get('width')), int(root.get('height')))
+    layout.vision = np.ones_like(layout.directions)
+
+    for layer in root.iter('layer'):
+        name = layer.get('name')
+        if name not in LAYERS:
+            continue
+        rows = layer.find('data').text.strip().split('\n')
+        for e_y, row in enumerate(rows):
+            for e_x, value in enumerate(row.strip(',').split(',')):
+                if value == '0':
+                    continue
+                key = value if name == 'decoration' else int(value)
+                if key not in tile_data:
+                    continue
+                tile_directions, actions, relative, vision = tile_data[key]
+                for r_x, r_y in relative:
+                    x, y = e_x + r_x, e_y + r_y
+                    if 0 <= x < layout.width and 0 <= y < layout.height:
+                        layout.present[x, y] = True
+                        layout.directions[x, y] &= np.array(tile_directions, np.uint8) != 0
+                        layout.vision[x, y] &= np.array(vision, np.uint8) != 0
+                        layout.walkable[x, y] |= 'move' in actions
+    return layout
+
+
+def shipped_maps():
+    """
+    The names of every tmx map in the game.
+    """
+    return sorted(name[:-4] for name in os.listdir("tiled/tilemaps") if name.endswith('.tmx'))
+
+
+def open_floor(width, height, seed=0) -> Layout:
+    """
+    A map that is floor everywhere.
+    """
+    layout = Layout(width, height)
+    layout.walkable[:] = True
+    layout.present[:] = True
+    return layout
+
+
+def maze(width, height, seed=0) -> Layout:
+    """
+    A maze with a wall between every tile except the passages, found with a random depth first search. There is only
+    one path between any two tiles, so searches go as deep as they possibly can.
+    """
+    rng = random.Random(seed)
+    layout = open_floor(width, height)
+    layout.directions[:] = 0
+
+    visited = np.zeros((width, height), bool)
+    visited[0, 0] = True
+    stack = [(0, 0)]
+    while stack:
+        x, y = stack[-1]
+        options = [(dir_dex, n_x, n_y) for dir_dex, (n_x, n_y) in enumerate(((x, y+1), (x+1, y), (x, y-1), (x-1, y)))
+                   if 0 <= n_x < width and 0 <= n_y < height and not visited[n_x, n_y]]
+        if not options:
+            stack.pop()
+            continue
+        dir_dex, n_x, n_y = rng.choice(options)
+        layout.directions[x, y, dir_dex] = 1
+        layout.directions[n_x, n_y, (dir_dex + 2) % 4] = 1
+        visited[n_x, n_y] = True
+        stack.append((n_x, n_y))
+    return layout
+
+
+def rooms(width, height, seed=0, room_size=6) -> Layout:
+    """
+    A grid of small rooms with a door in every wall. A quarter of the doors are shut, like the doors waiting on a
+    conversation in the game.
+    """
+    rng = random.Random(seed)
+    layout = open_floor(width, height)
+    for x in range(room_size - 1, width - 1, room_size):
+        for y_0 in range(0, height, room_size):
+            door = rng.randrange(y_0, min(y_0 + room_size, height))
+            for y in range(y_0, min(y_0 + room_size, height)):
+                if y != door or rng.random() < 0.25:
+                    layout.close(x, y, 1)
+    for y in range(room_size - 1, height - 1, room_size):
+        for x_0 in range(0, width, room_size):
+            door = rng.randrange(x_0, min(x_0 + room_size, width))
+            for x in range(x_0, min(x_0 + room_size, width)):
+                if x != door or rng.random() < 0.25:
+                    layout.close(x, y, 0)
+    return layout
+
+
+class Piece:
+    """
+    Stands in for an IsoSprite. It only has what a Tile reads.
+    """
+    def __init__(self, directions, actions):
+        self.direction = directions
+        self.vision_direction = directions
+        self.actions = actions
+        self.tile = None
+
+
+class BenchVision:
+    # The player hasn't seen anything.
+    vision = None
+    revision = 0
+
+    def __init__(self, map_size):
+        self.map_size = map_size
+
+    def modify_map(self, location, vision):
+        pass
+
+    def visible_mask(self):
+        return np.zeros(self.map_size[::-1], bool)
+
+
+class BenchPlayer:
+    def __init__(self, e_x, e_y, initiative=10):
+        self.e_x, self.e_y = e_x, e_y
+        self.path_finding_data = None
+
+        class ActionHandler:
+            pass
+        self.action_handler = ActionHandler()
+        self.action_handler.initiative = initiative
+
+
+class BenchView:
+    def __init__(self, player):
+        self.player = player
+
+
+class BenchMap:
+    """
+    Has everything of a Map the path finding uses, and real Tiles, but nothing that needs arcade or a window.
+    """
+    def __init__(self, layout: Layout, cache_budget=4 * 1024 * 1024):
+        self.map_size = layout.width, layout.height
+        self.vision_handler = BenchVision(self.map_size)
+        self.revision = 0
+        self.cost_maps = {}
+        self.path_grid = None
+        self.path_cache = PathCache(cache_budget)
+
+        walkable = np.argwhere(layout.walkable & layout.present)
+        centre = walkable[np.argmin(np.abs(walkable - np.array(self.map_size) // 2).sum(axis=1))]
+        self.game_view = BenchView(BenchPlayer(int(centre[0]), int(centre[1])))
+
+        self.tile_map = np.empty(self.map_size, Tile)
+        for x, y in np.argwhere(layout.present).tolist():
+            tile = Tile((x, y), self)
+            tile.add(Piece(layout.directions[x, y].tolist(), ('move',) if layout.walkable[x, y] else ()))
+            self.tile_map[x, y] = tile
+
+    def update_tile(self, tile):
+        # The same as Map.update_tile.
+        self.revision += 1
+        if self.path_grid is not None:
+            self.path_grid.update_tile(tile)
+
+
+# Every kind of synthetic map by name. The shipped maps are added to these by the benchmarks.
+GENERATORS = {'open': open_floor, 'maze': maze, 'rooms': rooms}
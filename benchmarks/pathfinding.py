@@ -0,0 +1,186 @@
+"""
+Time every path finding entry point on synthetic maps and the shipped maps scaled up, and write the results as JSON so
+they can be compared between commits.
+
+run from the top folder of the game with:
+    python -m benchmarks.pathfinding --sizes 30 128 --out before.json
+    python -m benchmarks.pathfinding --compare before.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+
+import numpy as np
+
+import algorithms
+from benchmarks.maps import GENERATORS, BenchMap, read_tmx, shipped_maps
+from flow_field import FlowField
+from hierarchy import Hierarchy
+
+SIZES = (30, 64, 128, 256, 512, 1024)
+INITIATIVES = (5, 10, 20)
+ALGORITHMS = ('base', 'target_player')
+
+# How many starting tiles each search is timed from.
+STARTS = 20
+
+
+def commit():
+    # The commit the benchmarks were run on, if there is one.
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def make_layout(kind, size):
+    if kind in GENERATORS:
+        return GENERATORS[kind](size, size)
+    return read_tmx(kind).tiled(size, size)
+
+
+class Timer:
+    """
+    Collects the time of every call to an entry point, and turns them into rows of the results.
+    """
+    def __init__(self, kind, size):
+        self.kind, self.size = kind, size
+        self.rows = []
+
+    def time(self, entry, function, *args, algorithm=None, initiative=None):
+        # Time a single call. Returns its result.
+        return self.time_each(entry, function, [args], algorithm, initiative)[0]
+
+    def time_each(self, entry, function, args_list, algorithm=None, initiative=None):
+        # Time a call for each of the arguments. Returns every result.
+        times, results = [], []
+        for args in args_list:
+            start_time = time.perf_counter()
+            results.append(function(*args))
+            times.append(time.perf_counter() - start_time)
+
+        if times:
+            self.rows.append({'map': self.kind, 'size': self.size, 'entry': entry, 'algorithm': algorithm,
+                              'initiative': initiative, 'calls': len(times), 'total_ms': sum(times) * 1000,
+                              'mean_ms': sum(times) / len(times) * 1000, 'min_ms': min(times) * 1000})
+        return results
+
+
+def bench_map(kind, size, starts):
+    """
+    Time everything on one map.
+    :return: the rows of the results.
+    """
+    rng = random.Random(size)
+    timer = Timer(kind, size)
+
+    bench = BenchMap(make_layout(kind, size))
+    tile_map = bench.tile_map
+
+    timer.time('find_neighbours', algorithms.find_neighbours, tile_map)
+    bench.path_grid = path_grid = timer.time('PathGrid', algorithms.PathGrid, tile_map)
+
+    walkable = [path_grid.location(index) for index in np.flatnonzero(path_grid.walkable).tolist()]
+    if not walkable:
+        return timer.rows
+    start_tiles = rng.sample(walkable, min(starts, len(walkable)))
+
+    for algorithm in ALGORITHMS:
+        for initiative in INITIATIVES:
+            bench.game_view.player.action_handler.initiative = initiative
+            args = [(tile_map, start, initiative, algorithm) for start in start_tiles]
+            searches = timer.time_each('path_2d', algorithms.path_2d, args, algorithm, initiative)
+            timer.time_each('path_field', algorithms.path_field,
+                            [(path_grid, start, initiative, algorithm) for start in start_tiles], algorithm, initiative)
+
+            # Path to the furthest tile each search reached.
+            goals = []
+            for start, (came_from, cost_so_far, edges, tile_costs) in zip(start_tiles, searches):
+                goals.append((start, max(cost_so_far, key=cost_so_far.get).location))
+            timer.time_each('reconstruct_path', algorithms.reconstruct_path,
+                            [(tile_map, searches[index][0], start, goal) for index, (start, goal) in enumerate(goals)],
+                            algorithm, initiative)
+
+            if algorithm == 'base':
+                timer.time_each('find_path', algorithms.find_path,
+                                [(path_grid, start, goal, initiative) for start, goal in goals], algorithm, initiative)
+
+                # The first pass fills the cache, the second is all hits.
+                for entry in ('PathCache.miss', 'PathCache.hit'):
+                    timer.time_each(entry, bench.path_cache.get,
+                                    [(path_grid, bench.revision, start, initiative, algorithm)
+                                     for start in start_tiles], algorithm, initiative)
+
+    bench.game_view.player.action_handler.initiative = INITIATIVES[-1]
+    flow_field = FlowField(path_grid)
+    timer.time('FlowField.update', flow_field.update, algorithms.cost_map(bench, 'target_player'),
+               algorithms.seen_map(bench), 'benchmark', algorithm='target_player')
+
+    hierarchy = timer.time('Hierarchy', Hierarchy, path_grid)
+    far = [(start, rng.choice(walkable)) for start in start_tiles]
+    timer.time_each('Hierarchy.find_path', hierarchy.find_path, far)
+    timer.time_each('Hierarchy.find_path', hierarchy.find_path,
+                    [(start, goal, INITIATIVES[-1]) for start, goal in far], initiative=INITIATIVES[-1])
+    return timer.rows
+
+
+def compare(old_location, new_location):
+    """
+    Print how the mean time of every entry point changed between two results files.
+    """
+    with open(old_location) as file:
+        old = json.load(file)
+    with open(new_location) as file:
+        new = json.load(file)
+
+    def key(row):
+        return row['map'], row['size'], row['entry'], row['algorithm'], row['initiative']
+
+    old_rows = {key(row): row for row in old['results']}
+    print(f"{old['commit']} -> {new['commit']}")
+    print(f"{'map':<10}{'size':>6}  {'entry':<22}{'algorithm':<15}{'init':>5}{'old ms':>11}{'new ms':>11}{'change':>9}")
+    for row in new['results']:
+        old_row = old_rows.get(key(row))
+        if old_row is None:
+            continue
+        change = row['mean_ms'] / old_row['mean_ms'] if old_row['mean_ms'] else float('nan')
+        print(f"{row['map']:<10}{row['size']:>6}  {row['entry']:<22}{str(row['algorithm']):<15}"
+              f"{str(row['initiative']):>5}{old_row['mean_ms']:>11.3f}{row['mean_ms']:>11.3f}{change:>8.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the path finding.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--maps', nargs='+', default=list(GENERATORS) + shipped_maps())
+    parser.add_argument('--starts', type=int, default=STARTS)
+    parser.add_argument('--out', default=None, help="where to write the results. benchmarks/results/ by default.")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="compare two results files and stop.")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = []
+    for kind in args.maps:
+        for size in args.sizes:
+            start_time = time.perf_counter()
+            results.extend(bench_map(kind, size, args.starts))
+            print(f"{kind} {size}x{size} took {time.perf_counter() - start_time:.1f}s")
+
+    revision = commit()
+    out = args.out or f"benchmarks/results/pathfinding-{revision or 'local'}.json"
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with open(out, 'w') as file:
+        json.dump({'commit': revision, 'python': platform.python_version(), 'numpy': np.__version__,
+                   'starts': args.starts, 'results': results}, file, indent=1)
+    print(f"wrote {out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,352 @@
+"""
+Check that every way of finding the vision gives what shaders/vision_frag.glsl gives, and time them.
+
+The vision from every walkable tile of the shipped maps and the synthetic maps is compared to what the shader gives.
+Unlit maps are checked from every walkable tile, lit maps from a handful.
+
+run from the top folder of the game with:
+    python -m benchmarks.vision --write-goldens
+    python -m benchmarks.vision
+
+The shader is the 'gl' backend. It needs arcade and a display, and without a screen it can run on a software driver,
+like:
+    LIBGL_ALWAYS_SOFTWARE=1 xvfb-run python -m benchmarks.vision --write-goldens
+Goldens can only be written by the shader, and are saved in benchmarks/goldens/. A map without goldens is checked
+against the shader live instead. If the shader can't run either, the backends are only checked against the 'cpu'
+backend, which says nothing about the shader, so the map is marked as such and --require-gl fails.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.maps import GENERATORS, read_tmx, shipped_maps
+import pvs
+from vision_cpu import OUTSIDE, cast_vision, cast_visions, radius_window
+
+SIZES = (30,)
+
+# How many tiles of each map the lit vision is checked from. A lit vision covers the whole map so it is slow.
+LIT_STARTS = 8
+
+GOLDENS = "benchmarks/goldens"
+
+
+def make_layout(kind, size):
+    if kind in GENERATORS:
+        return GENERATORS[kind](size, size)
+    return read_tmx(kind)
+
+
+def golden_location(kind, size):
+    # The shipped maps are always their own size.
+    if kind in GENERATORS:
+        return f"{GOLDENS}/vision-{kind}-{size}.npz"
+    return f"{GOLDENS}/vision-{kind}.npz"
+
+
+def find_casters(layout, lit_starts):
+    """
+    :return: the unlit and lit casters of a map, as lists of (x, y).
+    """
+    unlit = [(int(x), int(y)) for x, y in np.argwhere(layout.walkable & layout.present)]
+    lit = random.Random(len(unlit)).sample(unlit, min(lit_starts, len(unlit)))
+    return unlit, lit
+
+
+class Backend:
+    """
+    One way of finding the vision. visions gives the window each caster covers and the vision of it.
+    """
+    name = None
+
+    def prepare(self, walls, lit):
+        self.walls, self.lit = walls, lit
+
+    def visions(self, casters):
+        raise NotImplementedError
+
+    def warm(self, casters):
+        # Anything the game does once when a map loads rather than for every vision, so it isn't timed.
+        pass
+
+    def close(self):
+        pass
+
+
+class CpuBackend(Backend):
+    # Each caster on its own, like VisionCalculator.calculate_cpu.
+    name = 'cpu'
+
+    def visions(self, casters):
+        height, width = self.walls.shape[:2]
+        for caster in casters:
+            window = (0, 0, width, height) if self.lit else radius_window(*caster, width, height)
+            yield window, cast_vision(self.walls, caster, self.lit, window)
+
+
+class BatchBackend(Backend):
+    # Every caster together, like VisionCalculator.observe.
+    name = 'cpu-batch'
+    batch = 64
+
+    def visions(self, casters):
+        height, width = self.walls.shape[:2]
+        for start in range(0, len(casters), self.batch):
+            batch = casters[start:start+self.batch]
+            windows = [(0, 0, width, height) if self.lit else radius_window(*caster, width, height)
+                       for caster in batch]
+            yield from zip(windows, cast_visions(self.walls, batch, self.lit, windows))
+
+
+class PvsBackend(Backend):
+    # The baked visible sets. Only unlit maps are baked, so lit ones are skipped.
+    name = 'pvs'
+
+    def prepare(self, walls, lit):
+        super().prepare(walls, lit)
+        self.visible_sets = None
+
+    def warm(self, casters):
+        # The sets are baked when the map loads, so only the lookups are timed.
+        if self.lit:
+            return
+        height, width = self.walls.shape[:2]
+        walkable = np.zeros(width * height, bool)
+        walkable[[y * width + x for x, y in casters]] = True
+        self.visible_sets = pvs.bake_sets(self.walls, walkable)
+
+    def visions(self, casters):
+        if self.lit:
+            return
+        if self.visible_sets is None:
+            self.warm(casters)
+        for x, y in casters:
+            yield self.visible_sets.vision(x, y)
+
+
+class GlBackend(Backend):
+    """
+    The shader itself, through a VisionCalculator in a hidden window. Every vision is waited for.
+    """
+    name = 'gl'
+
+    def __init__(self):
+        import arcade
+        from vision import VisionCalculator
+
+        class Window(arcade.Window):
+            view_x = view_y = 0
+
+        class Caster:
+            e_x = e_y = 0
+
+        self.window = Window(64, 64, "vision", visible=False)
+        self.caster = Caster()
+        self.vision_calculator = VisionCalculator
+        self.calculator = None
+
+    def prepare(self, walls, lit):
+        super().prepare(walls, lit)
+        height, width = walls.shape[:2]
+        self.calculator = self.vision_calculator(self.window, self.caster, lit, backend='gl')
+        self.calculator.setup((width, height))
+        self.calculator.walls[:] = walls
+
+    def visions(self, casters):
+        for caster in casters:
+            self.caster.e_x, self.caster.e_y = caster
+            self.calculator.calculate()
+            self.calculator.collect_readback(wait=True)
+            x, y, width, height = window = self.calculator.vision_window
+            yield window, self.calculator.vision[y:y+height, x:x+width].copy()
+
+    def close(self):
+        self.window.close()
+
+
+def find_backends(names):
+    """
+    Make every backend asked for that can run here.
+    """
+    backends = []
+    for name in names:
+        if name == 'gl':
+            try:
+                backends.append(GlBackend())
+            except Exception as error:
+                # No arcade, no display, or no GL 3.3.
+                print(f"skipping gl: {error}", file=sys.stderr)
+        else:
+            backends.append({'cpu': CpuBackend, 'cpu-batch': BatchBackend, 'pvs': PvsBackend}[name]())
+    return backends
+
+
+def full_map(window, vision, map_size):
+    # Put the vision of a window into a whole map.
+    x, y, width, height = window
+    vision_map = np.empty((map_size[1], map_size[0], 4), np.uint8)
+    vision_map[:] = OUTSIDE
+    vision_map[y:y+height, x:x+width] = vision
+    return vision_map
+
+
+def find_goldens(kind, size, backend, lit_starts) -> dict:
+    """
+    Find the visions of a map with a backend, in the layout the goldens are saved in.
+    """
+    layout = make_layout(kind, size)
+    walls = layout.walls()
+    casters = find_casters(layout, lit_starts)
+
+    data = {'walls': walls, 'reference': np.array(backend.name)}
+    for mode, lit, mode_casters in (('unlit', False, casters[0]), ('lit', True, casters[1])):
+        backend.prepare(walls, lit)
+        windows, channels = [], []
+        for window, vision in backend.visions(mode_casters):
+            windows.append(window)
+            channels.append(vision[:, :, :2].reshape(-1, 2))
+        data[f'{mode}_casters'] = np.array(mode_casters, np.int64).reshape(-1, 2)
+        data[f'{mode}_windows'] = np.array(windows, np.int64).reshape(-1, 4)
+        data[f'{mode}_channels'] = np.concatenate(channels) if channels else np.zeros((0, 2), np.uint8)
+    return data
+
+
+def write_goldens(kind, size, backend, lit_starts):
+    """
+    Find the visions of a map with the shader and save them.
+    """
+    location = golden_location(kind, size)
+    os.makedirs(os.path.dirname(location), exist_ok=True)
+    np.savez_compressed(location, **find_goldens(kind, size, backend, lit_starts))
+    print(f"wrote {location} from {backend.name}")
+
+
+def load_goldens(kind, size, by_name, lit_starts) -> dict:
+    """
+    The goldens of a map: the saved ones, or else the visions of the shader, or else the visions of the cpu backend.
+    """
+    try:
+        with np.load(golden_location(kind, size)) as golden:
+            return {key: golden[key] for key in golden.files}
+    except OSError:
+        pass
+    reference = by_name.get('gl') or by_name.get('cpu') or CpuBackend()
+    golden = find_goldens(kind, size, reference, lit_starts)
+    golden['reference'] = np.array(f"{reference.name} live")
+    return golden
+
+
+def check_goldens(golden, backends):
+    """
+    Compare every backend to the goldens of a map. The backend a live golden came from isn't compared to itself.
+    :return: rows of (backend, mode, casters, seconds, visible mismatches, distance mismatches).
+    """
+    walls = golden['walls']
+    map_size = walls.shape[1], walls.shape[0]
+    reference = str(golden['reference'])
+
+    rows = []
+    for mode, lit in (('unlit', False), ('lit', True)):
+        casters = [tuple(caster) for caster in golden[f'{mode}_casters'].tolist()]
+        windows = golden[f'{mode}_windows']
+        starts = np.concatenate([[0], np.cumsum(windows[:, 2] * windows[:, 3])])
+
+        for backend in backends:
+            if reference == f"{backend.name} live":
+                continue
+            backend.prepare(walls, lit)
+            backend.warm(casters)
+            start_time = time.perf_counter()
+            visions = list(backend.visions(casters))
+            seconds = time.perf_counter() - start_time
+            if not visions:
+                continue
+
+            visible_wrong = distance_wrong = 0
+            for index, (window, vision) in enumerate(visions):
+                golden_vision = np.zeros((windows[index][3], windows[index][2], 4), np.uint8)
+                golden_vision[:, :, :2] = golden[f'{mode}_channels'][starts[index]:starts[index+1]].reshape(
+                    windows[index][3], windows[index][2], 2)
+                visible, distance = count_wrong((tuple(windows[index]), golden_vision), (window, vision), map_size)
+                visible_wrong += visible
+                distance_wrong += distance
+            rows.append((backend.name, mode, len(casters), seconds, visible_wrong, distance_wrong))
+    return rows
+
+
+def count_wrong(expected, found, map_size):
+    """
+    Compare two visions.
+    :param expected: the window and vision that are right.
+    :param found: the window and vision to check.
+    :param map_size: the width and height of the map.
+    :return: how many tiles differ in whether they can be seen, and in their distance.
+    """
+    expected_map, found_map = full_map(*expected, map_size), full_map(*found, map_size)
+
+    # A backend can cast a smaller window when the tiles outside it can't be seen anyway, so the distances are only
+    # compared where both cast.
+    covered = np.ones(map_size[::-1], bool)
+    for x, y, width, height in (expected[0], found[0]):
+        inside = np.zeros(map_size[::-1], bool)
+        inside[y:y+height, x:x+width] = True
+        covered &= inside
+
+    visible_wrong = int(((expected_map[:, :, 0] > 0) != (found_map[:, :, 0] > 0)).sum())
+    distance_wrong = int((expected_map[:, :, 1] != found_map[:, :, 1])[covered].sum())
+    return visible_wrong, distance_wrong
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and time the vision backends against the golden visions.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help="the sizes of the synthetic maps.")
+    parser.add_argument('--maps', nargs='+', default=list(GENERATORS) + shipped_maps())
+    parser.add_argument('--backends', nargs='+', default=['gl', 'cpu', 'cpu-batch', 'pvs'])
+    parser.add_argument('--lit-starts', type=int, default=LIT_STARTS)
+    parser.add_argument('--write-goldens', action='store_true',
+                        help="write the goldens with the shader instead of checking them.")
+    parser.add_argument('--require-gl', action='store_true', help="fail if the gl backend can't run.")
+    args = parser.parse_args()
+
+    backends = find_backends(['gl'] if args.write_goldens else args.backends)
+    if (args.require_gl or args.write_goldens) and 'gl' not in [backend.name for backend in backends]:
+        print("the gl backend can't run here", file=sys.stderr)
+        sys.exit(1)
+    if not backends:
+        print("no backend can run here", file=sys.stderr)
+        sys.exit(1)
+
+    by_name = {backend.name: backend for backend in backends}
+    maps = [(kind, size) for kind in args.maps for size in (args.sizes if kind in GENERATORS else [None])]
+    failed = False
+    if args.write_goldens:
+        for kind, size in maps:
+            write_goldens(kind, size, backends[0], args.lit_starts)
+    else:
+        print(f"{'map':<10}{'size':>6}  {'backend':<11}{'mode':<7}{'casters':>8}{'total ms':>10}{'per cast ms':>13}"
+              f"{'visible':>9}{'distance':>10}")
+        for kind, size in maps:
+            golden = load_goldens(kind, size, by_name, args.lit_starts)
+            note = "" if str(golden['reference']).startswith('gl') else ", the shader isn't checked"
+            print(f"{kind}{f' {size}' if size else ''} goldens from {golden['reference']}{note}")
+            rows = check_goldens(golden, backends)
+            for name, mode, casters, seconds, visible_wrong, distance_wrong in rows:
+                failed |= bool(visible_wrong or distance_wrong)
+                print(f"{kind:<10}{str(size or ''):>6}  {name:<11}{mode:<7}{casters:>8}{seconds * 1000:>10.1f}"
+                      f"{seconds * 1000 / casters:>13.3f}{visible_wrong:>9}{distance_wrong:>10}")
+
+        if failed:
+            print("some visions don't match the goldens", file=sys.stderr)
+
+    for backend in backends:
+        backend.close()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -28,6 +28,14 @@ class SimpleMoveBot(isometric.IsoActor):
         else:
             c.iso_append(self)
 
+    def can_see_player(self):
+        # If the player is in this bot's own line of sight. Not the player's line of sight to the bot. Every bot is
+        # observed together, and only the ones that have moved, or whose walls have changed, are cast again.
+        game_view = c.PLAYER.game_view
+        vision_handler = game_view.map_handler.map.vision_handler
+        vision_handler.observe(game_view.current_ai)
+        return vision_handler.can_see(self, c.PLAYER.e_x, c.PLAYER.e_y)
+
     def update(self):
         # The tiny terrible decision tree.
         if self.action_handler.current_action is None and self.action_handler.initiative > 0:
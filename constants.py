@@ -35,6 +35,30 @@ PLAYER = None
 # Map Information
 CURRENT_MAP_SIZE = 0, 0
 
+# The rough number of bytes each map can use to cache path finding searches.
+PATH_CACHE_BUDGET = 4 * 1024 * 1024
+
+# The rough number of bytes each map can use to cache past visions of the player.
+VISION_CACHE_BUDGET = 1024 * 1024
+
+# The rough number of bytes the loaded maps can use together. Past it the maps visited longest ago are unloaded down
+# to their compiled data, see map_residency.py.
+MAP_BUDGET = 64 * 1024 * 1024
+
+# Whether the maps around the current one are streamed in from the tiled world file and drawn past its edges, see
+# world.py and MapHandler.enter_world. The width and height of each chunk of the streaming world in tiles, and how many
+# chunks around the player and the camera are loaded.
+WORLD_MODE = False
+CHUNK_SIZE = 16
+CHUNK_RADIUS = 2
+
+# How the vision is found. 'gl' renders it with shaders/vision_frag.glsl, 'cpu' finds the same thing with numpy and
+# doesn't need a GL context.
+VISION_BACKEND = 'gl'
+
+# How far from the player, in tiles, the bots' flow field reaches. Bots further away path find through the map's rooms.
+FLOW_FIELD_RADIUS = 20
+
 """
 FUNCTIONS
 """
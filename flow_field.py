@@ -0,0 +1,102 @@
+import heapq
+
+import numpy as np
+
+import algorithms
+
+
+class FlowField:
+    """
+    The flow field is one cost field that every bot hunting the player shares. Rather than each bot searching the map
+    on its turn, the field is found once each time the player moves, and a bot only has to follow it downhill.
+
+    Every tile that can be moved onto is a possible goal, costing how close it is to the player. The field is then
+    spread out backwards from all of the goals at once, and stepping onto a tile costs as much as the player can see
+    it, so every tile's vision is counted once. Like the bots have always picked the cheapest tile they could reach no
+    matter how far it was, the number of steps only breaks ties. So each tile ends up pointing along the shortest of
+    the sneakiest paths to the best spot near the player.
+
+    The field can be limited to a window around the player, so its cost doesn't grow with the size of the map.
+    """
+    def __init__(self, path_grid: algorithms.PathGrid):
+        self.path_grid = path_grid
+
+        # What the field was made from. If nothing has changed it doesn't need to be found again.
+        self.key = None
+
+        # The cost from each tile to its best goal, and the next tile along the way. -1 if the tile is its own goal.
+        self.cost = np.full(path_grid.size, np.inf)
+        self.parent = np.full(path_grid.size, -1, np.int32)
+
+    def update(self, goal_cost, seen, key, window=None):
+        """
+        Find the field again, but only if the key has changed.
+
+        :param goal_cost: how good each tile is to end up on, lower is better. The 'target_player' cost map, which has
+        the vision of each tile in it as well. That is taken back out, as it is charged when the tile is stepped onto.
+        :param seen: how much each tile is seen by the player, in the y * width + x order of the PathGrid.
+        :param key: anything that changes when the field needs to be found again.
+        :param window: the (min x, min y, max x, max y) of the tiles the field covers, max exclusive. None is the whole
+        map.
+        """
+        if key == self.key:
+            return
+        self.key = key
+
+        path_grid = self.path_grid
+
+        # Every cost is scaled by more than the longest path, so a step only costs one once scaled. Getting one closer
+        # to the player, or being seen one less, is always worth more than any number of steps.
+        scale = path_grid.size
+        step = (seen.astype(np.int64) * scale + 1).tolist()
+
+        inside = path_grid.walkable.copy()
+        if window is not None:
+            x_0, y_0, x_1, y_1 = window
+            outside = np.ones((path_grid.height, path_grid.width), bool)
+            outside[max(y_0, 0):max(y_1, 0), max(x_0, 0):max(x_1, 0)] = False
+            inside[outside.ravel()] = False
+
+        cost = np.where(inside, (goal_cost.astype(np.int64) - seen) * scale, np.inf)
+        parent = np.full(path_grid.size, -1, np.int32)
+
+        # Every tile that can be moved onto starts in the frontier as its own goal.
+        frontier = list(zip(cost[inside].tolist(), np.flatnonzero(inside).tolist()))
+        heapq.heapify(frontier)
+
+        reverse_end, reverse_adjacency = path_grid.graph(reverse=True)
+        cost_list = cost.tolist()
+        parent_list = parent.tolist()
+        inside_list = inside.tolist()
+        while frontier:
+            current_cost, current = heapq.heappop(frontier)
+            if current_cost > cost_list[current]:
+                continue
+
+            # Walking backwards, so the tiles that can move onto current get current's cost plus the cost of entering.
+            new_cost = current_cost + step[current]
+            for neighbour in reverse_adjacency[4 * current:reverse_end[current]]:
+                # Tiles outside the window are never reached.
+                if new_cost < cost_list[neighbour] and inside_list[neighbour]:
+                    cost_list[neighbour] = new_cost
+                    parent_list[neighbour] = current
+                    heapq.heappush(frontier, (new_cost, neighbour))
+
+        self.cost = np.array(cost_list)
+        self.parent = np.array(parent_list, np.int32)
+
+    def path(self, start_xy, max_dist):
+        """
+        Follow the field from a tile.
+        :param start_xy: the x and y position of the bot.
+        :param max_dist: how many tiles the bot can move.
+        :return: a list of the Tiles to move through, not including the start. None if the tile is outside the field.
+        """
+        path = []
+        current = self.path_grid.index(start_xy)
+        if self.cost[current] == np.inf:
+            return None
+        while len(path) < max_dist and self.parent[current] >= 0:
+            current = int(self.parent[current])
+            path.append(self.path_grid.tiles[current])
+        return path
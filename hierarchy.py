@@ -0,0 +1,270 @@
+import heapq
+from collections import deque
+from typing import Dict, List, Tuple
+
+import algorithms
+
+
+class Cluster:
+    """
+    One square section of the map. The entrances are the tiles on its edges where an actor can cross into a neighbouring
+    cluster, and the edges are the shortest distances between them without leaving the cluster.
+    """
+    def __init__(self, x, y, width, height):
+        # The euclidean position and size of the cluster in tiles.
+        self.x, self.y = x, y
+        self.width, self.height = width, height
+
+        self.entrances: set = set()
+        self.edges: Dict[int, Dict[int, int]] = {}
+
+    def __contains__(self, xy):
+        return self.x <= xy[0] < self.x + self.width and self.y <= xy[1] < self.y + self.height
+
+
+class Hierarchy:
+    """
+    Hierarchical path finding (HPA*). The map is split into clusters, and the clusters are linked through their
+    entrances into a much smaller abstract graph. A long search is run on the abstract graph first, and only the part of
+    the path that is actually needed is turned back into tiles. So a search across the whole map costs about as much as
+    the number of clusters rather than the number of tiles.
+
+    When a tile changes only the clusters around it are built again.
+    """
+
+    # The width and height of each cluster in tiles.
+    CLUSTER_SIZE = 10
+
+    def __init__(self, path_grid: algorithms.PathGrid, cluster_size: int = CLUSTER_SIZE):
+        self.path_grid = path_grid
+        self.cluster_size = cluster_size
+
+        self.clusters: Dict[Tuple[int, int], Cluster] = {}
+        for y in range(0, path_grid.height, cluster_size):
+            for x in range(0, path_grid.width, cluster_size):
+                self.clusters[x // cluster_size, y // cluster_size] = Cluster(
+                    x, y, min(cluster_size, path_grid.width - x), min(cluster_size, path_grid.height - y))
+
+        # The crossings between each pair of neighbouring clusters as (from, to) flat indexes, and every crossing
+        # by the tile it starts on.
+        self.borders: Dict[Tuple[tuple, tuple], List[Tuple[int, int]]] = {}
+        self.crossings: Dict[int, set] = {}
+
+        # The version of the PathGrid the clusters are up to date with, and its movement mask as a list which is much
+        # quicker to read one tile at a time.
+        self.version = path_grid.version
+        self.mask = path_grid.mask.tolist()
+
+        for key in self.clusters:
+            for other in ((key[0] + 1, key[1]), (key[0], key[1] + 1)):
+                if other in self.clusters:
+                    self.build_border(key, other)
+        for key in self.clusters:
+            self.build_cluster(key)
+
+    def cluster_key(self, index) -> Tuple[int, int]:
+        x, y = self.path_grid.location(index)
+        return x // self.cluster_size, y // self.cluster_size
+
+    def build_border(self, key, other):
+        """
+        Find the crossings between two neighbouring clusters. Every run of tiles along the border that can be crossed
+        in the same direction gets one crossing in the middle of the run.
+        :param key: the first cluster, to the left of or below the other.
+        :param other: the second cluster.
+        """
+        path_grid = self.path_grid
+        cluster = self.clusters[key]
+
+        if other[0] > key[0]:
+            # A vertical border. Crossing it moves in direction 1 (+x) or 3 (-x).
+            inside = [path_grid.index((cluster.x + cluster.width - 1, y))
+                      for y in range(cluster.y, cluster.y + cluster.height)]
+            directions = 1, 3
+            along = 0
+        else:
+            # A horizontal border. Crossing it moves in direction 0 (+y) or 2 (-y).
+            inside = [path_grid.index((x, cluster.y + cluster.height - 1))
+                      for x in range(cluster.x, cluster.x + cluster.width)]
+            directions = 0, 2
+            along = 1
+        outside = [index + path_grid.offsets[directions[0]] for index in inside]
+
+        for from_index, to_index in self.borders.pop((key, other), ()):
+            self.crossings[from_index].discard(to_index)
+
+        def joined(first, second):
+            # Whether two tiles next to each other along the border can move onto each other.
+            return self.mask[first] >> along & 1 and self.mask[second] >> ((along + 2) % 4) & 1
+
+        crossings = []
+        for dir_dex, pairs in ((directions[0], list(zip(inside, outside))), (directions[1], list(zip(outside, inside)))):
+            run = []
+            for from_index, to_index in pairs:
+                if run and not (joined(run[-1][0], from_index) and joined(run[-1][1], to_index)):
+                    # A wall along the border splits the run, as the tiles on each side might not be connected.
+                    crossings.append(run[len(run) // 2])
+                    run = []
+                if self.mask[from_index] >> dir_dex & 1:
+                    run.append((from_index, to_index))
+                elif run:
+                    crossings.append(run[len(run) // 2])
+                    run = []
+            if run:
+                crossings.append(run[len(run) // 2])
+
+        self.borders[(key, other)] = crossings
+        for from_index, to_index in crossings:
+            self.crossings.setdefault(from_index, set()).add(to_index)
+
+    def local_search(self, index, cluster: Cluster, reverse=False) -> Dict[int, int]:
+        """
+        Find the distance from a tile to every tile it can reach without leaving its cluster.
+        :param index: the flat index of the tile.
+        :param cluster: the cluster to stay in.
+        :param reverse: find the distance to the tile from every tile that can reach it instead.
+        :return: a dict of flat indexes to distances.
+        """
+        width = self.path_grid.width
+        adjacency_end, adjacency = self.path_grid.graph(reverse)
+        x_0, x_1 = cluster.x, cluster.x + cluster.width
+        y_0, y_1 = cluster.y, cluster.y + cluster.height
+
+        distances = {index: 0}
+        frontier = deque((index,))
+        while frontier:
+            current = frontier.popleft()
+            for neighbour in adjacency[4 * current:adjacency_end[current]]:
+                y, x = divmod(neighbour, width)
+                if x_0 <= x < x_1 and y_0 <= y < y_1 and neighbour not in distances:
+                    distances[neighbour] = distances[current] + 1
+                    frontier.append(neighbour)
+        return distances
+
+    def build_cluster(self, key):
+        """
+        Find the entrances of a cluster and the distances between them.
+        """
+        cluster = self.clusters[key]
+        cluster.entrances = set()
+        for border in (((key[0] - 1, key[1]), key), ((key[0], key[1] - 1), key),
+                       (key, (key[0] + 1, key[1])), (key, (key[0], key[1] + 1))):
+            for from_index, to_index in self.borders.get(border, ()):
+                cluster.entrances.update(index for index in (from_index, to_index) if self.cluster_key(index) == key)
+
+        cluster.edges = {}
+        for entrance in cluster.entrances:
+            distances = self.local_search(entrance, cluster)
+            cluster.edges[entrance] = {other: distances[other] for other in cluster.entrances
+                                       if other != entrance and other in distances}
+
+    def refresh(self):
+        """
+        Build the clusters around every tile that has changed since the last refresh.
+        """
+        if self.version == self.path_grid.version:
+            return
+        path_grid = self.path_grid
+        changed = path_grid.changed_since(self.version)
+        self.version = path_grid.version
+
+        # A change only touches the mask of the tile and its neighbours, so only they are copied again. If the changes
+        # are too old to be kept every cluster is built again.
+        if changed is None:
+            self.mask = path_grid.mask.tolist()
+            dirty = set(self.clusters)
+        else:
+            dirty = set()
+            for index in changed:
+                for near in [index] + [path_grid.neighbour(index, dir_dex) for dir_dex in range(4)]:
+                    if near >= 0:
+                        self.mask[near] = int(path_grid.mask[near])
+        for index in changed or ():
+            key = self.cluster_key(index)
+            dirty.add(key)
+            dirty.update(other for other in ((key[0] + 1, key[1]), (key[0] - 1, key[1]),
+                                             (key[0], key[1] + 1), (key[0], key[1] - 1)) if other in self.clusters)
+
+        for key in dirty:
+            for other in ((key[0] + 1, key[1]), (key[0], key[1] + 1)):
+                if other in self.clusters:
+                    self.build_border(key, other)
+        for key in dirty:
+            self.build_cluster(key)
+
+    def find_path(self, start_xy, goal_xy, max_dist=None) -> list:
+        """
+        Find the path between two tiles anywhere on the map.
+
+        :param start_xy: The starting x and y position.
+        :param goal_xy: The x and y position to find the path to.
+        :param max_dist: Only this many tiles of the path are needed. The rest of the path isn't turned into tiles.
+        :return: the list of tiles to move through, not including the start. Empty if the goal can't be reached.
+        """
+        self.refresh()
+        path_grid = self.path_grid
+        start, goal = path_grid.index(start_xy), path_grid.index(goal_xy)
+        if start == goal:
+            return []
+
+        # Link the start and goal to the entrances of their clusters.
+        start_cluster = self.clusters[self.cluster_key(start)]
+        goal_cluster = self.clusters[self.cluster_key(goal)]
+        from_start = self.local_search(start, start_cluster)
+        to_goal = self.local_search(goal, goal_cluster, reverse=True)
+
+        def neighbours(node):
+            if node == start:
+                yield from ((entrance, from_start[entrance]) for entrance in start_cluster.entrances
+                            if entrance in from_start)
+                if goal in from_start:
+                    yield goal, from_start[goal]
+            else:
+                cluster = self.clusters[self.cluster_key(node)]
+                yield from cluster.edges.get(node, {}).items()
+                if node in to_goal:
+                    yield goal, to_goal[node]
+            yield from ((other, 1) for other in self.crossings.get(node, ()))
+
+        def heuristic(node):
+            x, y = path_grid.location(node)
+            return abs(x - goal_xy[0]) + abs(y - goal_xy[1])
+
+        # A* on the abstract graph.
+        came_from = {start: (-1, 0)}
+        cost_so_far = {start: 0}
+        frontier = [(heuristic(start), start)]
+        while frontier:
+            priority, current = heapq.heappop(frontier)
+            if current == goal:
+                break
+            if priority > cost_so_far[current] + heuristic(current):
+                continue
+            for neighbour, cost in neighbours(current):
+                new_cost = cost_so_far[current] + cost
+                if neighbour not in cost_so_far or new_cost < cost_so_far[neighbour]:
+                    cost_so_far[neighbour] = new_cost
+                    came_from[neighbour] = current, cost
+                    heapq.heappush(frontier, (new_cost + heuristic(neighbour), neighbour))
+        else:
+            return []
+
+        abstract = []
+        current = goal
+        while current != start:
+            previous, cost = came_from[current]
+            abstract.append((previous, current, cost))
+            current = previous
+        abstract.reverse()
+
+        # Turn the abstract path back into tiles, one section at a time, until there is enough of it.
+        path = []
+        for previous, current, cost in abstract:
+            if max_dist is not None and len(path) >= max_dist:
+                break
+            if cost == 1 and current in self.crossings.get(previous, ()):
+                path.append(path_grid.tiles[current])
+            else:
+                path.extend(algorithms.find_path(path_grid, path_grid.location(previous),
+                                                 path_grid.location(current), cost))
+        return path if max_dist is None else path[:max_dist]
@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from math import *
+import threading
 
 import arcade
 
@@ -7,6 +8,10 @@ import constants as c
 from turn import ActionHandler
 import tiles
 
+# The map size sprites are cast with on this thread, if it isn't c.CURRENT_MAP_SIZE. A map is prepared on a worker
+# thread while another map is being played, see mapdata.Map.prepare.
+CASTING = threading.local()
+
 
 def cast_to_iso(e_x: float, e_y: float, mods: tuple = (0, 0, 0)):
     """
@@ -18,8 +23,9 @@ def cast_to_iso(e_x: float, e_y: float, mods: tuple = (0, 0, 0)):
     :return: the isometric x, y, w found.
     """
 
-    e_x -= c.CURRENT_MAP_SIZE[0]/2
-    e_y -= c.CURRENT_MAP_SIZE[1]/2
+    map_size = getattr(CASTING, 'map_size', None) or c.CURRENT_MAP_SIZE
+    e_x -= map_size[0]/2
+    e_y -= map_size[1]/2
 
     # because the sprites are already cast to the ~30 degrees for the isometric the only needed rotations is the
     # 45 degrees. However since cos and sin 45 are both 0.707 they are removed from the system as it simply makes
@@ -324,9 +330,17 @@ class IsoActor(IsoSprite):
         """
         if self.path_finding_grid is not None:
             from algorithms import path_2d
-            self.path_finding_data = path_2d(self.path_finding_grid, (self.e_x, self.e_y),
-                                             max_dist=self.action_handler.initiative,
-                                             algorithm=self.algorithm)
+
+            # If the map has compiled its path grid use the map's cached array engine, otherwise use the tile engine.
+            start = self.path_finding_grid[self.e_x, self.e_y]
+            if start is not None and start.map.path_grid is not None:
+                self.path_finding_data = start.map.find_paths((self.e_x, self.e_y),
+                                                              max_dist=self.action_handler.initiative,
+                                                              algorithm=self.algorithm)
+            else:
+                self.path_finding_data = path_2d(self.path_finding_grid, (self.e_x, self.e_y),
+                                                 max_dist=self.action_handler.initiative,
+                                                 algorithm=self.algorithm)
 
     def hit(self, shooter):
         """
@@ -423,7 +437,7 @@ class IsoLayer:
     def __init__(self, layer_data, map_data, sprite_data, tile_map, shown=True):
         """
         nigh pointless class that's here for backwards compatability.
-        :param layer_data: the layer tmx
+        :param layer_data: the name of the layer
         :param map_data: a 2d array of numbers pointing to different spirtes.
         :param sprite_data: all the iso sprites
         :param tile_map: a 2d array of sprites
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Goes up whenever what is compiled changes, so the old files are compiled again.
+MAP_CACHE_VERSION = 2
+
+# The files besides the tmx map that a compiled map comes from. The tiles decide the directions and walls.
+TILE_SOURCES = ("data/tiles.json", "data/special_tiles.json")
+
+
+def cache_location(location: str) -> str:
+    # The compiled map is kept next to the tmx map.
+    return f"tiled/tilemaps/{location}.map.npz"
+
+
+def source_files(location: str) -> tuple:
+    return (f"tiled/tilemaps/{location}.tmx",) + TILE_SOURCES
+
+
+def file_hash(path: str) -> str:
+    with open(path, 'rb') as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+def section_hash(item_data: dict) -> str:
+    # Tells if the map's part of map_data.json is the same as when it was compiled.
+    return hashlib.sha1(json.dumps(item_data, sort_keys=True).encode()).hexdigest()
+
+
+def pack_bits(sides: np.ndarray) -> np.ndarray:
+    # Turn shape (..., 4) sides into one byte each, bit i set if the side in direction i is open.
+    return ((sides != 0) * (1 << np.arange(4, dtype=np.uint8))).sum(axis=-1).astype(np.uint8)
+
+
+def unpack_bits(bits: np.ndarray) -> np.ndarray:
+    return (bits[..., None] >> np.arange(4, dtype=np.uint8)) & 1
+
+
+class CompiledMap:
+    """
+    Everything Map.load_map needs from a tmx map and the tiles. A map that has been loaded before doesn't read the tmx
+    again, and doesn't work out the walls of its tiles one piece at a time. The sprites are still made when it loads,
+    but only for the cells that hold something.
+    """
+
+    def __init__(self, map_size, layers, present, directions, vision, walls, walkable):
+        """
+        :param map_size: the width and height of the map.
+        :param layers: the (name, shown, grid) of every layer in order. The grid is the tmx layer data, shape
+        (height, width) so it is indexed [e_y, e_x].
+        :param present: whether each tile exists, indexed [x, y] like the tile_map.
+        :param directions: the packed movement directions of each tile, indexed [x, y].
+        :param vision: the packed vision directions of each tile, indexed [x, y].
+        :param walls: the packed wall map the vision handler had after loading, indexed [x, y]. Not always the same
+        as vision, a tile with only a gate on it has no walls.
+        :param walkable: whether each tile can be moved onto, indexed [x, y]. Only the streaming world reads it, a
+        loaded map has its tiles to tell.
+        """
+        self.map_size = tuple(map_size)
+        self.layers = layers
+        self.present = present
+        self.directions = directions
+        self.vision = vision
+        self.walls = walls
+        self.walkable = walkable
+
+    def apply_walls(self, tile_map, vision_handler):
+        """
+        Give every tile and the vision handler the walls they had when the map was compiled, all at once.
+        """
+        directions, vision = unpack_bits(self.directions).tolist(), unpack_bits(self.vision).tolist()
+        for x, y in np.argwhere(self.present).tolist():
+            tile = tile_map[x, y]
+            tile.directions = directions[x][y]
+            tile.vision = vision[x][y]
+        vision_handler.set_walls(unpack_bits(self.walls).transpose(1, 0, 2) * np.uint8(255))
+
+    def save(self, location: str, item_data: dict):
+        sources = source_files(location)
+        np.savez_compressed(cache_location(location), version=MAP_CACHE_VERSION, map_size=np.array(self.map_size),
+                            layer_names=np.array([name for name, shown, grid in self.layers]),
+                            layer_shown=np.array([shown for name, shown, grid in self.layers], bool),
+                            grids=np.stack([grid for name, shown, grid in self.layers]),
+                            present=self.present, directions=self.directions, vision=self.vision, walls=self.walls,
+                            walkable=self.walkable,
+                            sources=np.array(sources), mtimes=np.array([os.path.getmtime(path) for path in sources]),
+                            hashes=np.array([file_hash(path) for path in sources]), section=section_hash(item_data))
+
+
+def compile_map(map_size, layers, tile_map, vision_handler) -> CompiledMap:
+    """
+    Compile a map once it has been loaded from the tmx.
+    :param map_size: the width and height of the map.
+    :param layers: the (name, shown, grid) of every layer, see CompiledMap.
+    :param tile_map: the loaded tiles, indexed [x, y].
+    :param vision_handler: the map's vision handler, which holds the wall map.
+    """
+    present = np.zeros(map_size, bool)
+    directions = np.zeros(tuple(map_size) + (4,), np.uint8)
+    vision = np.zeros(tuple(map_size) + (4,), np.uint8)
+    walkable = np.zeros(map_size, bool)
+    for x, column in enumerate(tile_map):
+        for y, tile in enumerate(column):
+            if tile is not None:
+                present[x, y] = True
+                directions[x, y] = tile.directions
+                vision[x, y] = tile.vision
+                walkable[x, y] = 'move' in tile.available_actions
+    walls = pack_bits(vision_handler.walls.transpose(1, 0, 2) >= 255)
+    return CompiledMap(map_size, layers, present, pack_bits(directions), pack_bits(vision), walls, walkable)
+
+
+def load_map(location: str, item_data: dict):
+    """
+    Load the compiled map.
+    :param location: the name of the tmx map.
+    :param item_data: the map's part of map_data.json.
+    :return: the compiled map, or None if there is no file or it was compiled from different sources.
+    """
+    try:
+        with np.load(cache_location(location)) as data:
+            if (int(data['version']) != MAP_CACHE_VERSION or str(data['section']) != section_hash(item_data) or
+                    tuple(data['sources'].tolist()) != source_files(location)):
+                return None
+
+            for path, mtime, digest in zip(data['sources'].tolist(), data['mtimes'].tolist(),
+                                           data['hashes'].tolist()):
+                # A file that has been saved again without changing is checked by what is in it.
+                if os.path.getmtime(path) != mtime and file_hash(path) != digest:
+                    return None
+
+            layers = [(name, shown, grid) for name, shown, grid in
+                      zip(data['layer_names'].tolist(), data['layer_shown'].tolist(), data['grids'])]
+            return CompiledMap(data['map_size'].tolist(), layers, data['present'], data['directions'],
+                               data['vision'], data['walls'], data['walkable'])
+    except (OSError, KeyError, ValueError):
+        return None
@@ -0,0 +1,47 @@
+from collections import OrderedDict
+
+
+class MapResidency:
+    """
+    The map residency keeps track of which maps are loaded and roughly how much memory each uses. Once the loaded maps
+    go over the memory budget the maps visited longest ago are unloaded down to their compiled data, see Map.unload.
+    The map being played is never unloaded.
+    """
+
+    def __init__(self, budget: int):
+        """
+        :param budget: The rough number of bytes the loaded maps can use together.
+        """
+        self.budget = budget
+
+        # The name of every loaded map and how many bytes it used when it was last measured, visited longest ago first.
+        self.loaded: OrderedDict[str, int] = OrderedDict()
+
+        # For tuning the budget.
+        self.unloads = 0
+
+    @property
+    def used(self) -> int:
+        return sum(self.loaded.values())
+
+    def visit(self, location: str, maps: dict):
+        """
+        Called when a map is entered, once it is loaded.
+        :param location: the name of the map.
+        :param maps: every map by its name.
+        """
+        self.loaded[location] = 0
+        self.loaded.move_to_end(location)
+
+        # The maps that have been left still grow a little, like their caches, so they are all measured again.
+        for name in self.loaded:
+            self.loaded[name] = maps[name].footprint()
+
+        while self.used > self.budget and len(self.loaded) > 1:
+            self.evict(maps)
+
+    def evict(self, maps: dict):
+        # unload the map visited longest ago.
+        name, size = self.loaded.popitem(last=False)
+        maps[name].unload()
+        self.unloads += 1
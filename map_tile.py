@@ -1,6 +1,8 @@
-import isometric
+from typing import Tuple, List, Dict, TYPE_CHECKING
 
-from typing import Tuple, List, Dict
+# isometric loads arcade, but the tiles only need it for type hints. This lets the path finding run without a window.
+if TYPE_CHECKING:
+    import isometric
 
 
 class Tile:
@@ -17,8 +19,8 @@ class Tile:
         self.seen = False
 
         # all the pieces and all the iso actors
-        self.pieces: List[isometric.IsoSprite] = []
-        self.actors: List[isometric.IsoActor] = []
+        self.pieces: List['isometric.IsoSprite'] = []
+        self.actors: List['isometric.IsoActor'] = []
 
         # the directions that are connected to other neighboring tiles. and the directions that can be seen.
         self.directions = [1, 1, 1, 1]
@@ -81,7 +83,7 @@ class Tile:
             elif other in self.available_actions[action] and action not in other.actions:
                 self.available_actions[action].remove(other)
 
-        self.map.changed = True
+        self.map.update_tile(self)
 
     def mix_directions(self, other):
         """
@@ -133,7 +135,22 @@ class Tile:
                 else:
                     self.available_actions[action].append(other)
 
-            self.map.changed = True
+            self.map.update_tile(self)
+
+    def place(self, other):
+        """
+        add a new iso sprite to a tile whose directions and vision are already known, like when a compiled map is
+        loaded. Only its actions are found.
+        :param other: the new iso sprite.
+        """
+        if other not in self.pieces:
+            other.tile = self
+            self.pieces.append(other)
+            for action in other.actions:
+                if action not in self.available_actions:
+                    self.available_actions[action] = [other]
+                else:
+                    self.available_actions[action].append(other)
 
     def remove(self, other):
         """
@@ -150,7 +167,7 @@ class Tile:
                 if not len(self.available_actions[action]):
                     self.available_actions.pop(action)
 
-            self.map.changed = True
+            self.map.update_tile(self)
 
     def __le__(self, other):
         # for sorting in a QUEUE system. find more in algorithms.py
@@ -1,8 +1,9 @@
 import numpy as np
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 import math
-import time
 
 import arcade
 
@@ -10,14 +11,57 @@ import algorithms
 import isometric
 import constants as c
 import interaction
+import map_cache
+from map_residency import MapResidency
 from vision import VisionCalculator
+from vision_cpu import VISION_RADIUS
 from map_tile import Tile
+from path_cache import PathCache
+from flow_field import FlowField
+from hierarchy import Hierarchy
+from world import World
 
 # GATES and POI_LIGHTS are the highlights used to show the player points of interest and gates. each index represents a
 # direction in order: south, east, north, west
 GATES = {index: data for index, data in enumerate(isometric.generate_iso_data_other("gate_highlight"))}
 POI_LIGHTS = {index: data for index, data in enumerate(isometric.generate_iso_data_other("poi_highlight"))}
 
+# The colour of a tile that has been seen but can't be seen now.
+SEEN_COLOR = (95, 205, 228)
+
+# The rough number of bytes each sprite and each tile of a loaded map uses, for the memory budget of the maps.
+SPRITE_BYTES = 2048
+TILE_BYTES = 512
+
+# The tiled world file that places the maps next to each other.
+WORLD = "tiled/tilemaps/demo_world.world"
+
+
+def read_world(location=WORLD):
+    """
+    Read which maps touch each other in a tiled world file.
+    :param location: the world file.
+    :return: a dict of the name of each map to the set of maps touching it. Empty if there is no world file.
+    """
+    try:
+        with open(location) as file:
+            entries = json.load(file)['maps']
+    except (OSError, KeyError, ValueError):
+        return {}
+
+    boxes = {}
+    for entry in entries:
+        name = os.path.splitext(os.path.basename(entry['fileName']))[0]
+        boxes[name] = (entry['x'], entry['y'], entry['x'] + entry['width'], entry['y'] + entry['height'])
+
+    world = {name: set() for name in boxes}
+    for name, (left, top, right, bottom) in boxes.items():
+        for other, (other_left, other_top, other_right, other_bottom) in boxes.items():
+            if (other != name and left <= other_right and other_left <= right and
+                    top <= other_bottom and other_top <= bottom):
+                world[name].add(other)
+    return world
+
 
 class Map:
     """
@@ -28,32 +72,69 @@ class Map:
 
         # The str location of the tmx data and the json data.
         self.location = location
-        self.tmx_map = arcade.read_tmx(f"tiled/tilemaps/{self.location}.tmx")
         self.item_data = data[location]
 
+        # The compiled map, see map_cache.py. The tmx is only read when it is missing or out of date, and then the map
+        # is compiled once it has loaded. Both are read in prepare so it can happen away from the main thread.
+        self.compiled: map_cache.CompiledMap = None
+        self.tmx_map = None
+
         # the maps unique vision handler.
         self.lit = location == "tutorial"
         self.vision_handler = VisionCalculator(game_view.window, game_view.player, self.lit)
 
-        # The size of the map.
-        self.map_size = self.tmx_map.map_size
+        # The size of the map. Known once the map has been read.
+        self.map_size = (0, 0)
         self.map_width, self.map_height = self.map_size
 
+        # Where the map puts the player the first time it is shown, if it has a player tile.
+        self.player_start = None
+
+        # Whether the map is loaded and ready to be played. When the maps go over their memory budget the ones visited
+        # longest ago are unloaded, and only the state of their doors and the tiles that have been seen are kept until
+        # they are loaded again. See unload.
+        self.loaded = False
+        self.door_states: dict = None
+        self.seen_tiles: np.ndarray = None
+
         # The bots
         self.bots = []
 
-        # If anything on the map has changed
-        self.changed = True
+        # Goes up by one every time anything on the map changes. Anything that depends on the map can keep the revision
+        # it was made with to tell if it is out of date.
+        self.revision = 0
 
         # The data of each layer, rooms, and tiles.
         self.toggle_sprites = {}
         self.layers = {}
         self.rooms = {}
-        self.tile_map = np.empty(self.map_size, Tile)
+        self.tile_map: np.ndarray = None
+
+        # The flat array version of the tile map used by the pathfinding. Made once all the tiles are loaded.
+        self.path_grid: algorithms.PathGrid = None
+        self.path_cache = PathCache(c.PATH_CACHE_BUDGET)
+
+        # The cost field all the bots use to hunt the player.
+        self.flow_field: FlowField = None
+
+        # The clusters of the map used for long searches. rooms holds the same clusters.
+        self.hierarchy: Hierarchy = None
+
+        # The cost map of each path finding algorithm, and what it was made from. Found in algorithms.cost_map.
+        self.cost_maps = {}
 
         # sprites with animations.
         self.animated_sprites = []
 
+        # Which tiles exist and have been seen, indexed [x, y], and the colour and alpha hide_walls gave each tile,
+        # shape (height, width, 4) like the shading texture of the vision handler. The pieces of the tiles are drawn
+        # with the shading, so only the tiles whose pieces change have to be touched.
+        self.present: np.ndarray = None
+        self.seen: np.ndarray = None
+        self.shading: np.ndarray = None
+        self.shade_window = None
+        self.shade_dirty = set()
+
     def load_map(self):
         """
         The load map scrip runs through the provided map and creates an
@@ -63,14 +144,64 @@ class Map:
 
         These IsoLayers are then stored by their name in a dictionary.
         """
+        self.prepare()
+        self.finish()
+
+    def read_map(self):
+        # Read the compiled map, or the tmx if it has to be compiled again. A map loaded again keeps its compiled map.
+        if self.compiled is None:
+            self.compiled = map_cache.load_map(self.location, self.item_data)
+        if self.compiled is None:
+            self.tmx_map = arcade.read_tmx(f"tiled/tilemaps/{self.location}.tmx")
+            self.map_size = tuple(self.tmx_map.map_size)
+        else:
+            self.map_size = self.compiled.map_size
+        self.map_width, self.map_height = self.map_size
+        self.tile_map = np.empty(self.map_size, Tile)
 
+    def prepare(self):
+        """
+        Everything load_map does that doesn't need GL or change what is being played. It reads the map, makes the
+        tiles, sprites, and path finding data, and bakes the vision. MapHandler runs it on a worker thread for the
+        maps next to the current one, see MapHandler.preload.
+        """
+        self.read_map()
+
+        # The sprites are cast with this map's size, even when another map is being played.
+        isometric.CASTING.map_size = self.map_size
+        try:
+            self.build()
+            if self.door_states is not None:
+                self.restore()
+        finally:
+            isometric.CASTING.map_size = None
+
+    def finish(self):
+        """
+        The rest of load_map, which has to run on the main thread once the map has been prepared.
+        """
         self.game_view.reset_bots()
+        c.set_map_size(self.map_size)
+        self.vision_handler.create_textures()
+        c.set_floor(self.layers['floor'].tiles)
+        self.loaded = True
+        if self.door_states is not None:
+            # Like set_map, a map that is gone back to doesn't place the player or its bots again.
+            self.door_states = self.seen_tiles = None
+            return
+
+        if self.player_start is not None:
+            self.game_view.player.new_pos(*self.player_start)
+        for bot in self.bots:
+            if bot.shown:
+                self.game_view.new_bot(bot)
+
+    def build(self):
+        # Make every tile and sprite of the map from its layers.
         self.bots = []
-        self.vision_handler.setup(tuple(self.map_size))
+        self.vision_handler.setup(self.map_size, textures=False)
         self.animated_sprites = []
 
-        c.set_map_size(self.map_size)
-
         @dataclass()
         class BotData:
             x: int = 0
@@ -81,18 +212,28 @@ class Map:
 
         self.toggle_sprites = {}
 
-        for layer_num, layer_data in enumerate(self.tmx_map.layers):
-            location = layer_data.name
+        # The (name, shown, grid) of every layer. The grid is the raw tile data indexed [e_y, e_x].
+        if self.compiled is None:
+            layers = []
+            for layer_data in self.tmx_map.layers:
+                if layer_data.properties is not None:
+                    shown = layer_data.properties.get('shown', True)
+                else:
+                    shown = True
+                layers.append((layer_data.name, shown, np.array(layer_data.layer_data, np.uint32)))
+        else:
+            layers = self.compiled.layers
 
-            if layer_data.properties is not None:
-                shown = layer_data.properties.get('shown', True)
+        def add_piece(tile, piece):
+            # A compiled map already knows the walls of every tile, so the pieces don't have to work them out.
+            if self.compiled is None:
+                tile.add(piece)
             else:
-                shown = True
+                tile.place(piece)
 
-            # Create the IsoList for the tiles, renames the layer's raw tile 2D array for better readability,
-            # and create the 2D numpy array
+        for location, shown, map_data in layers:
+            # Create the IsoList for the tiles and the 2D numpy array
             tile_list = []
-            map_data = layer_data.layer_data
             tile_map = np.empty(self.map_size, list)
 
             def generate_poi(data):
@@ -116,7 +257,7 @@ class Map:
                             tile_directions.add(pos)
                         if self.tile_map[pos] is None:
                             self.tile_map[pos] = Tile(pos, self)
-                        self.tile_map[pos].add(tile)
+                        add_piece(self.tile_map[pos], tile)
 
                     if len(current_tiles):
                         for tile in current_tiles:
@@ -127,7 +268,7 @@ class Map:
                                     highlight = isometric.IsoSprite(tile.e_x, tile.e_y, POI_LIGHTS[i])
                                     tile_list.append(highlight)
                                     tile_map[e_x, e_y].append(highlight)
-                                    self.tile_map[tile.e_x, tile.e_y].add(highlight)
+                                    add_piece(self.tile_map[tile.e_x, tile.e_y], highlight)
 
             def generate_door(data):
                 door_data = self.item_data['door'].get(str(data))
@@ -140,7 +281,7 @@ class Map:
                     tile_map[e_x, e_y] = current_tile
                     if self.tile_map[e_x, e_y] is None:
                         self.tile_map[e_x, e_y] = Tile((e_x, e_y), self)
-                    self.tile_map[e_x, e_y].add(current_tile)
+                    add_piece(self.tile_map[e_x, e_y], current_tile)
 
                     if target_id not in self.toggle_sprites:
                         self.toggle_sprites[target_id] = []
@@ -191,13 +332,13 @@ class Map:
                         self.animated_sprites.append(tile)
                     if self.tile_map[tile.e_x, tile.e_y] is None:
                         self.tile_map[tile.e_x, tile.e_y] = Tile((e_x, e_y), self)
-                    self.tile_map[tile.e_x, tile.e_y].add(tile)
+                    add_piece(self.tile_map[tile.e_x, tile.e_y], tile)
 
             def generate_isoactor(data):
                 isoactor_data = self.item_data['character'].get(str(data))
                 if isoactor_data is not None:
                     if isoactor_data['type'] == "player":
-                        self.game_view.player.new_pos(e_x, e_y)
+                        self.player_start = (e_x, e_y)
                     elif isoactor_data['type'] == "dummy":
                         iso_data = isometric.generate_iso_data_other(isoactor_data['type'])
                         dummy = isometric.IsoSprite(e_x, e_y, *iso_data,
@@ -209,7 +350,7 @@ class Map:
                         self.animated_sprites.append(dummy)
                         if self.tile_map[e_x, e_y] is None:
                             self.tile_map[e_x, e_y] = Tile((e_x, e_y), self)
-                        self.tile_map[e_x, e_y].add(dummy)
+                        add_piece(self.tile_map[e_x, e_y], dummy)
                     else:
                         new_bot = BotData(e_x, e_y, isoactor_data['type'], isoactor_data['start_active'])
                         self.bots.append(new_bot)
@@ -218,20 +359,133 @@ class Map:
                                     'poi': generate_poi, 'door': generate_door, 'char': generate_isoactor,
                                     'decoration': generate_decoration}
 
-            # Loop through the tile data.
-            for e_y, row in enumerate(map_data):
-                for e_x, tile_value in enumerate(row):
-                    # If there is a tile in found in the data create the appropriate tile.
-                    if tile_value:
-                        generation_functions.get(location, generate_layer)(tile_value)
-
-            self.layers[location] = isometric.IsoLayer(layer_data, map_data, tile_list, tile_map, shown)
+            # Create the appropriate tile for every cell that holds one, in the same order as the rows of the data.
+            cells = np.argwhere(map_data).tolist()
+            for (e_y, e_x), tile_value in zip(cells, map_data[map_data != 0].tolist()):
+                generation_functions.get(location, generate_layer)(tile_value)
+
+            self.layers[location] = isometric.IsoLayer(location, map_data, tile_list, tile_map, shown)
+
+        if self.compiled is None:
+            self.compiled = map_cache.compile_map(self.map_size, layers, self.tile_map, self.vision_handler)
+            try:
+                self.compiled.save(self.location, self.item_data)
+            except OSError:
+                # It is compiled again next time the game starts.
+                pass
+            self.tmx_map = None
+        else:
+            self.compiled.apply_walls(self.tile_map, self.vision_handler)
 
-        c.set_floor(self.layers['floor'].tiles)
         algorithms.find_neighbours(self.tile_map)
-        for bot in self.bots:
-            if bot.shown:
-                self.game_view.new_bot(bot)
+        self.path_grid = algorithms.PathGrid(self.tile_map)
+        self.vision_handler.bake(self.location, self.path_grid.walkable)
+        self.flow_field = FlowField(self.path_grid)
+        self.hierarchy = Hierarchy(self.path_grid)
+        self.rooms = self.hierarchy.clusters
+
+    def restore(self):
+        # Put the doors and the seen tiles back how they were when the map was unloaded.
+        for target_id, states in self.door_states.items():
+            for door, state in zip(self.toggle_sprites.get(target_id, []), states):
+                while door.current_state != state:
+                    door.toggle_states()
+        for x, y in np.argwhere(self.seen_tiles).tolist():
+            if self.tile_map[x, y] is not None:
+                self.tile_map[x, y].seen = True
+
+    def unload(self):
+        """
+        Throw away the tiles, sprites, path finding data, and vision of the map to save memory. Only the compiled map,
+        the state of each door, and the tiles that have been seen are kept. It is loaded again with prepare and finish.
+        A map that was only prepared and never finished keeps the door states and seen tiles it was prepared from.
+        """
+        if self.loaded:
+            self.door_states = {target_id: [door.current_state for door in doors]
+                                for target_id, doors in self.toggle_sprites.items()}
+            self.seen_tiles = np.zeros(self.map_size, bool)
+            for x, column in enumerate(self.tile_map):
+                for y, tile in enumerate(column):
+                    if tile is not None and tile.seen:
+                        self.seen_tiles[x, y] = True
+
+        self.loaded = False
+        self.tile_map = None
+        self.layers = {}
+        self.toggle_sprites = {}
+        self.rooms = {}
+        self.bots = []
+        self.animated_sprites = []
+        self.path_grid = None
+        self.path_cache = PathCache(c.PATH_CACHE_BUDGET)
+        self.flow_field = None
+        self.hierarchy = None
+        self.cost_maps = {}
+        self.present = self.seen = self.shading = None
+        self.shade_window = None
+        self.shade_dirty = set()
+        self.vision_handler.release()
+
+    def footprint(self) -> int:
+        """
+        :return: the rough number of bytes the map uses while it is loaded.
+        """
+        if not self.loaded:
+            return 0
+        sprites = sum(len(layer.tiles) for layer in self.layers.values())
+        return (sprites * SPRITE_BYTES + self.map_width * self.map_height * TILE_BYTES + self.path_cache.used +
+                self.vision_handler.footprint())
+
+    def update_tile(self, tile):
+        """
+        Called by a tile whenever its pieces, directions, or actions change.
+        :param tile: the changed tile.
+        """
+        self.revision += 1
+        if self.path_grid is not None:
+            self.path_grid.update_tile(tile)
+        if self.shading is not None:
+            self.shade_dirty.add(tile.location)
+
+    def find_paths(self, start_xy, max_dist, algorithm="base"):
+        """
+        Find the path data of a search on this map. Searches are cached until the map changes.
+        :param start_xy: The starting x and y position.
+        :param max_dist: The maximum distance a tile can be before it stops processing.
+        :param algorithm: which algorithm to use when calculating the cost.
+        :return: The came_from and cost_so_far dictionaries, costs_loaded and edges.
+        """
+        return self.path_cache.get(self.path_grid, self.revision, start_xy, max_dist, algorithm).path_data()
+
+    def flow_path(self, start_xy, max_dist, target=None):
+        """
+        Find the path a bot should take towards the player. The flow field is only found again when the player, the
+        map, or the player's vision has changed, so every bot in a turn shares the same one.
+
+        Like the bots have always done, a bot goes to the random target it picked next to the player if it can get
+        there this turn. Otherwise it follows the flow field to the best tile it can. The flow field only covers the
+        tiles around the player. Bots further away than that head towards the player through the rooms of the map
+        until they are close enough to use it.
+        :param start_xy: the x and y position of the bot.
+        :param max_dist: how many tiles the bot can move.
+        :param target: the x and y position of the tile the bot picked.
+        :return: a list of the Tiles to move through.
+        """
+        if target is not None and tuple(target) != tuple(start_xy):
+            path = algorithms.find_path(self.path_grid, start_xy, target, max_dist)
+            if path:
+                return path
+
+        player = self.game_view.player
+        key = (player.e_x, player.e_y, player.action_handler.initiative, self.revision, self.vision_handler.revision)
+        window = (player.e_x - c.FLOW_FIELD_RADIUS, player.e_y - c.FLOW_FIELD_RADIUS,
+                  player.e_x + c.FLOW_FIELD_RADIUS + 1, player.e_y + c.FLOW_FIELD_RADIUS + 1)
+        self.flow_field.update(algorithms.cost_map(self, 'target_player'), algorithms.seen_map(self), key, window)
+
+        path = self.flow_field.path(start_xy, max_dist)
+        if path is None:
+            path = self.hierarchy.find_path(start_xy, (player.e_x, player.e_y), max_dist)
+        return path
 
     def strip_map(self):
         """
@@ -259,6 +513,7 @@ class Map:
                     c.iso_extend(tile.pieces)
                     c.iso_extend(tile.actors)
         self.vision_handler.regenerate = 2
+        self.shading = None
 
     def draw(self):
         self.vision_handler.draw()
@@ -269,68 +524,103 @@ class Map:
     def hide_walls(self):
         """
         Based on the data generated by the vision handler. Find what tiles to show and what to hide.
+
+        The shading of every tile is found with numpy around the last and the new vision, since nothing further away
+        can have changed, and sent to the vision handler's shading texture in one write. The pieces look their
+        shading up in it when they are drawn.
         """
-        s = time.time()
-        checked = set()
+        vision = self.vision_handler
+        bots = self.game_view.current_ai
+        if bots:
+            for bot, visible in zip(bots, vision.is_visible(np.array([bot.e_x for bot in bots]),
+                                                            np.array([bot.e_y for bot in bots])).tolist()):
+                if visible:
+                    c.iso_append(bot)
+                else:
+                    c.iso_remove(bot)
 
-        remove = []
-        show = []
-        for bot in self.game_view.current_ai:
-            if self.vision_handler.vision_image.getpixel((bot.e_x, bot.e_y))[0]:
-                c.iso_append(bot)
-            else:
-                c.iso_remove(bot)
-
-        for x in self.tile_map:
-            for y in x:
-                if y is not None:
-                    if not self.vision_handler.vision_image.getpixel(y.location)[0]:
-                        if y not in checked:
-                            if y.seen:
-                                for piece in y.pieces:
-                                    piece.alpha = 150
-                                    piece.color = (95, 205, 228)
-                            else:
-                                for piece in y.pieces:
-                                    piece.alpha = 0
-                    else:
-                        y.seen = True
-                        for piece in y.pieces:
-                            piece.alpha = 255
-
-                            if self.lit:
-                                color = 255
-                            else:
-                                # the distance is the value normalised and the map size relative to 15.
-                                # so dist/255 * map/15 or (map*dist)/(255*15) or (map*dist)/3825
-                                distance = (self.vision_handler.vision_image.getpixel(y.location)[1] *
-                                            self.map_size[0]/3825)
-
-                                color = max(int(255 - 255*distance), 0)
-                            piece.color = (color, color, color)
-
-                        for index, tile in enumerate(y.neighbours):
-                            if (tile is not None and tile not in checked and
-                                    not self.vision_handler.vision_image.getpixel(tile.location)[0] and
-                                    y.vision[index] and not tile.vision[(index+2) % 4]):
-                                checked.add(tile)
-                                tile.seen = True
-                                for piece in tile.pieces:
-                                    piece.alpha = 255
-
-                                    if self.lit:
-                                        color = 255
-                                    else:
-                                        # the distance is the value normalised and the map size relative to 15.
-                                        # so dist/255 * map/15 or (map*dist)/(255*15) or (map*dist)/3825
-                                        distance = self.vision_handler.vision_image.getpixel(y.location)[1] * \
-                                                   self.map_size[0] / 3825
-
-                                        color = max(int(255 - 255 * distance), 0)
-                                    piece.color = (color, color, color)
+        if self.shading is None or vision.vision_window is None or self.shade_window is None:
+            self.reset_shading()
+            left, bottom, right, top = 0, 0, *self.map_size
+        else:
+            # The box around both visions, and one more tile for the walls they show.
+            left, bottom = min(self.shade_window[0], vision.vision_window[0]), min(self.shade_window[1],
+                                                                                  vision.vision_window[1])
+            right = max(self.shade_window[0] + self.shade_window[2], vision.vision_window[0] + vision.vision_window[2])
+            top = max(self.shade_window[1] + self.shade_window[3], vision.vision_window[1] + vision.vision_window[3])
+            left, bottom = max(left - 1, 0), max(bottom - 1, 0)
+            right, top = min(right + 1, self.map_size[0]), min(top + 1, self.map_size[1])
+        self.shade_window = vision.vision_window
+        region = (slice(left, right), slice(bottom, top))
+        window = (left, bottom, right - left, top - bottom)
+
+        # Everything is indexed [x, y] like the tile_map, with a border of one tile so the neighbours line up.
+        present = np.pad(self.present[region], 1)
+        visible = np.pad(vision.visible_mask(window).T, 1) & present
+        is_open = np.pad(vision.walls[bottom:top, left:right].transpose(1, 0, 2) >= 255, ((1, 1), (1, 1), (0, 0)))
+        if self.lit:
+            brightness = np.full(visible.shape, 255)
+        else:
+            # The further a tile is from the player the darker it is, until it is black at the edge of the vision.
+            distance = vision.distance_field(window).T
+            brightness = np.pad(np.maximum(255 - 255 * distance / VISION_RADIUS, 0).astype(int), 1)
+
+        # A tile that can't be seen is still shown if a tile that can be seen looks at it through its side, and it
+        # blocks the view. Like the wall of a room. It takes the colour of the first tile that shows it, in the order
+        # the tiles used to be gone through, which is left, below, above, then right.
+        inner = (slice(1, -1), slice(1, -1))
+        shown_by = {1: (slice(0, -2), slice(1, -1)), 0: (slice(1, -1), slice(0, -2)),
+                    2: (slice(1, -1), slice(2, None)), 3: (slice(2, None), slice(1, -1))}
+        hidden = present[inner] & ~visible[inner]
+        revealed = np.zeros(hidden.shape, bool)
+        revealed_color = np.zeros(hidden.shape, int)
+        for index, other in shown_by.items():
+            shows = (hidden & ~revealed & visible[other] & is_open[other + (index,)] &
+                     ~is_open[inner + ((index + 2) % 4,)])
+            revealed_color[shows] = brightness[other][shows]
+            revealed |= shows
+
+        visible, brightness = visible[inner], brightness[inner]
+        seen = self.seen[region] | visible | revealed
+        for x, y in np.argwhere(seen & ~self.seen[region]).tolist():
+            self.tile_map[left + x, bottom + y].seen = True
+        self.seen[region] = seen
+
+        shading = np.zeros(seen.shape + (4,), np.uint8)
+        shading[seen] = (*SEEN_COLOR, 150)
+        shading[revealed, :3] = revealed_color[revealed, None]
+        shading[visible, :3] = brightness[visible, None]
+        shading[visible | revealed, 3] = 255
+        self.shading[bottom:top, left:right] = shading.transpose(1, 0, 2)
+        vision.write_shading(window, self.shading[bottom:top, left:right])
+
+        for location in self.shade_dirty:
+            self.shade_tile(self.tile_map[location])
+        self.shade_dirty.clear()
+
+    def reset_shading(self):
+        # Forget the shading of every tile so the whole map is shaded again.
+        self.present = np.zeros(self.map_size, bool)
+        self.seen = np.zeros(self.map_size, bool)
+        self.shading = np.zeros((self.map_size[1], self.map_size[0], 4), np.uint8)
+        self.shade_dirty.clear()
+        for x, column in enumerate(self.tile_map):
+            for y, tile in enumerate(column):
+                if tile is not None:
+                    self.present[x, y] = True
+                    self.seen[x, y] = tile.seen
+                    self.shade_tile(tile)
+
+    def shade_tile(self, tile):
+        # Give the pieces of a tile the index of the tile as their depth, so they are drawn with its shading. Their
+        # colour is left alone so fades and highlights still work, see shaders/shaded_sprite_vs.glsl.
+        x, y = tile.location
+        index = y * self.map_size[0] + x + 1
+        for piece in tile.pieces:
+            piece.depth = index
 
     def check_seen(self, location):
-        return bool(self.vision_handler.vision_image.getpixel(location)[0])
+        return self.vision_handler.is_visible(*location)
 
 
 class MapHandler:
@@ -347,17 +637,76 @@ class MapHandler:
         self.map = Map(game_view, self.map_data, 'tutorial')
         self.maps['tutorial'] = self.map
 
+        # The maps next to each other in the world. The maps the player could go to next are prepared on the worker
+        # thread while they play, and wait in preloading with the future of their preparation.
+        self.world = read_world()
+        self.worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="map preload")
+        self.preloading = {}
+
+        # Unloads the maps visited longest ago once the loaded maps use too much memory.
+        self.residency = MapResidency(c.MAP_BUDGET)
+
+        # The streaming world around the current map, only used when c.WORLD_MODE is on. It shows the plain layers of
+        # the maps around this one so the world carries on past its edges, see enter_world.
+        self.streaming: World = None
+
+    def neighbours(self, location):
+        """
+        The maps a player could go to from a map, through its gates or across the world.
+        :param location: the name of the map.
+        :return: the names of the maps, leaving out targets that aren't maps like "GameFinish".
+        """
+        targets = {gate['target'] for gate in self.map_data[location].get('gates', {}).values()}
+        targets |= self.world.get(location, set())
+        return [target for target in sorted(targets) if target in self.map_data]
+
+    def preload(self):
+        """
+        Start preparing every map next to the current one that isn't loaded, so using a gate to it only has to finish
+        it on the main thread. That includes the maps that were unloaded to stay in the memory budget.
+
+        The prepared maps aren't counted by the residency, so the ones that aren't next to the current map any more
+        are thrown away instead of waiting outside the budget.
+        """
+        neighbours = self.neighbours(self.map.location)
+        for location in [location for location in self.preloading if location not in neighbours]:
+            old_map, preparing = self.preloading.pop(location)
+            if not preparing.cancel():
+                # The worker runs one job at a time in order, so this runs once the preparation is done.
+                self.worker.submit(old_map.unload)
+
+        for location in neighbours:
+            next_map = self.maps.get(location)
+            if location not in self.preloading and (next_map is None or not next_map.loaded):
+                if next_map is None:
+                    next_map = Map(self.game_view, self.map_data, location)
+                self.preloading[location] = (next_map, self.worker.submit(next_map.prepare))
+
     def use_gate(self, gate_data):
         if gate_data['target'] == "GameFinish":
             self.game_view.window.show_end()
         else:
+            self.leave_world()
             self.map.strip_map()
             next_map = self.maps.get(gate_data['target'])
-            if next_map is None:
-                next_map = Map(self.game_view, self.map_data, gate_data['target'])
+            if next_map is None or not next_map.loaded:
+                if gate_data['target'] in self.preloading:
+                    next_map, preparing = self.preloading.pop(gate_data['target'])
+                    # Usually it is already done, but if not waiting is still quicker than starting again.
+                    preparing.result()
+                else:
+                    next_map = next_map or Map(self.game_view, self.map_data, gate_data['target'])
+                    next_map.prepare()
                 self.maps[gate_data['target']] = next_map
                 self.map = next_map
-                self.load_map()
+
+                # A map that was unloaded is shown the same way as one being gone back to.
+                reloaded = next_map.door_states is not None
+                self.map.finish()
+                if reloaded:
+                    self.map.set_map()
+                else:
+                    self.initial_show()
             else:
                 self.map = next_map
                 self.map.set_map()
@@ -371,6 +720,9 @@ class MapHandler:
             self.game_view.current_motion = None
             self.game_view.motion = False
             c.iso_append(self.game_view.player)
+            self.residency.visit(self.map.location, self.maps)
+            self.preload()
+            self.enter_world()
 
     def load_map(self):
         """
@@ -381,6 +733,69 @@ class MapHandler:
         """
         self.map.load_map()
         self.initial_show()
+        self.residency.visit(self.map.location, self.maps)
+        self.preload()
+        self.enter_world()
+
+    def enter_world(self):
+        """
+        In world mode start streaming the world around the map just entered. Its sprites are cast around this map, so
+        the world is made again every time the map changes. The maps that haven't been compiled yet are left out until
+        then.
+        """
+        if not c.WORLD_MODE:
+            return
+        compiled = {}
+        for location in self.map_data:
+            known = self.maps.get(location)
+            if known is not None and known.compiled is not None:
+                compiled[location] = known.compiled
+            else:
+                compiled[location] = map_cache.load_map(location, self.map_data[location])
+        self.streaming = World(compiled, WORLD, frame=self.map.location)
+        if self.streaming.frame is None:
+            # The map isn't in the world, so there is nothing around it.
+            self.streaming = None
+        self.update_world()
+
+    def update_world(self):
+        """
+        Load the chunks around the player and the centre of the camera, and swap the sprites of the chunks that were
+        loaded and unloaded in and out of the sprite lists. Called every update.
+        """
+        if self.streaming is None:
+            return
+        origin_x, origin_y = self.streaming.placement(self.map.location)
+        player, window = self.game_view.player, self.game_view.window
+        view_x, view_y = isometric.cast_from_iso(window.view_x + c.SCREEN_WIDTH/2, window.view_y + c.SCREEN_HEIGHT/2)
+        loaded, unloaded = self.streaming.update((player.e_x + origin_x, player.e_y + origin_y),
+                                                 (view_x + origin_x, view_y + origin_y))
+        for chunk in unloaded:
+            self.hide_chunk(chunk)
+        for chunk in loaded:
+            self.show_chunk(chunk)
+
+    def leave_world(self):
+        # Take the sprites of every loaded chunk out of the sprite lists before the map changes.
+        if self.streaming is not None:
+            for chunk in self.streaming.chunks.values():
+                self.hide_chunk(chunk)
+            self.streaming = None
+
+    def show_chunk(self, chunk):
+        # The maps around this one aren't in its vision, so they are drawn like tiles that have been seen before.
+        for sprites in chunk.sprites.values():
+            for sprite in sprites:
+                sprite.color = (*SEEN_COLOR, 150)
+        c.GROUND_LIST.extend(chunk.sprites.get('floor', []))
+        c.iso_extend(chunk.sprites.get('wall', []) + chunk.sprites.get('decoration', []))
+
+    def hide_chunk(self, chunk):
+        for sprite in chunk.sprites.get('floor', []):
+            if sprite in c.GROUND_LIST:
+                c.GROUND_LIST.remove(sprite)
+        for sprite in chunk.sprites.get('wall', []) + chunk.sprites.get('decoration', []):
+            c.iso_remove(sprite)
 
     def input_show(self, second_args=('wall', 'poi', 'door')):
         shown_tiles = []
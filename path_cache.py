@@ -0,0 +1,131 @@
+from collections import OrderedDict
+from typing import Dict, Set, Tuple
+
+import algorithms
+
+
+class PathCache:
+    """
+    The path cache holds the PathFields of past searches on one map so an actor walking back and forth across a room
+    doesn't have to search again. Every field is keyed on (map revision, start tile, max_dist, algorithm), and the least
+    recently used fields are thrown away once the cache goes over its memory budget.
+    """
+
+    # Only these algorithms have costs that depend on nothing but the map. The others change with the player.
+    CACHEABLE = ('base',)
+
+    # A field can only be cut down to a smaller max_dist if the priority of every tile is its cost.
+    TRUNCATABLE = ('base',)
+
+    # How many searches are kept so they can be repaired, rather than searched again, when the map changes.
+    REPAIR_SLOTS = 4
+
+    def __init__(self, budget: int):
+        """
+        :param budget: The rough number of bytes the cached fields can use.
+        """
+        self.budget = budget
+        self.used = 0
+
+        # The revision of the map the fields are from. When the map changes every field is out of date.
+        self.revision = -1
+
+        self.fields: OrderedDict[tuple, algorithms.PathField] = OrderedDict()
+
+        # The max_dists that have been cached for each start tile and algorithm. Used to find a field to truncate.
+        self.distances: Dict[Tuple[tuple, str], Set[int]] = {}
+
+        # The incremental searches of the most recently used start tiles.
+        self.repairs: OrderedDict[tuple, algorithms.IncrementalPath] = OrderedDict()
+
+        # For tuning the budget.
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.fields.clear()
+        self.distances.clear()
+        self.used = 0
+
+    def get(self, path_grid, revision, start_xy, max_dist, algorithm="base") -> algorithms.PathField:
+        """
+        Find the PathField for a search. If it isn't cached then a larger field from the same tile is truncated, and if
+        there isn't one of those the search is run.
+
+        :param path_grid: The PathGrid of the map.
+        :param revision: The current revision of the map.
+        :param start_xy: The starting x and y position.
+        :param max_dist: The maximum distance a tile can be before it stops processing.
+        :param algorithm: which algorithm to use when calculating the cost.
+        :return: the PathField.
+        """
+        if algorithm not in self.CACHEABLE:
+            return algorithms.path_field(path_grid, start_xy, max_dist, algorithm)
+
+        if revision != self.revision:
+            self.keep_repairs()
+            self.clear()
+            self.revision = revision
+
+        start_xy = tuple(start_xy)
+        key = (revision, start_xy, max_dist, algorithm)
+        field = self.fields.get(key)
+        if field is not None:
+            self.hits += 1
+            self.fields.move_to_end(key)
+            return field
+
+        self.misses += 1
+        larger = [dist for dist in self.distances.get((start_xy, algorithm), ()) if dist > max_dist]
+        if larger and algorithm in self.TRUNCATABLE:
+            field = self.fields[(revision, start_xy, min(larger), algorithm)].truncate(max_dist)
+        elif start_xy in self.repairs and algorithm == 'base':
+            # The map has changed since this tile was searched, only repair what changed.
+            self.repairs.move_to_end(start_xy)
+            field = self.repairs[start_xy].compute(max_dist)
+        else:
+            field = algorithms.path_field(path_grid, start_xy, max_dist, algorithm)
+
+        self.put(key, field)
+        return field
+
+    def keep_repairs(self):
+        """
+        Before the fields of an old revision are thrown away, turn the most recently used ones into incremental searches
+        so they can be repaired.
+        """
+        recent = {}
+        for (revision, start_xy, max_dist, algorithm), field in reversed(self.fields.items()):
+            if len(recent) >= self.REPAIR_SLOTS:
+                break
+            if algorithm == 'base' and start_xy not in self.repairs and start_xy not in recent:
+                recent[start_xy] = field
+
+        # Add the least recent first so the most recent ends up last in the LRU order.
+        for start_xy, field in reversed(recent.items()):
+            self.repairs[start_xy] = algorithms.IncrementalPath.from_field(field)
+
+        while len(self.repairs) > self.REPAIR_SLOTS:
+            self.repairs.popitem(last=False)
+
+    def put(self, key, field: algorithms.PathField):
+        size = field.nbytes
+        if size > self.budget:
+            return
+
+        self.fields[key] = field
+        self.distances.setdefault((key[1], key[3]), set()).add(key[2])
+        self.used += size
+
+        while self.used > self.budget:
+            self.evict()
+
+    def evict(self):
+        # remove the least recently used field.
+        (revision, start_xy, max_dist, algorithm), field = self.fields.popitem(last=False)
+        self.used -= field.nbytes
+
+        distances = self.distances[(start_xy, algorithm)]
+        distances.discard(max_dist)
+        if not distances:
+            self.distances.pop((start_xy, algorithm))
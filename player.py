@@ -16,7 +16,7 @@ class Player(isometric.IsoActor):
         super().__init__(e_x, e_y, PLAYER_ISO_DATA)
         self.game_view = game_view
         self.walls = []
-        self.path_finding_last = {'init': -1, 'pos': (-1, -1)}
+        self.path_finding_last = {'init': -1, 'pos': (-1, -1), 'revision': -1}
         self.animations = {
             'idle': isometric.IsoAnimation("assets/characters/Iso_Idle.png", (320, 320), (0, 0), 15, 1/12),
             'fire': isometric.IsoAnimation("assets/characters/Iso_Idle.png", (320, 320), (0, 640), 6, 1/12),
@@ -56,21 +56,22 @@ class Player(isometric.IsoActor):
 
     def load_paths(self, algorithm='base'):
         if self.action_handler.initiative >= 0:
+            revision = self.game_view.map_handler.map.revision
             if self.path_finding_last['init'] != self.action_handler.initiative or \
                self.path_finding_last['pos'] != (self.e_x, self.e_y) or \
-               self.game_view.map_handler.map.changed:
-                self.game_view.map_handler.map.changed = False
+               self.path_finding_last['revision'] != revision:
                 super().load_paths()
                 self.gen_walls()
-                self.path_finding_last = {'init': self.action_handler.initiative, 'pos': (self.e_x, self.e_y)}
+                self.path_finding_last = {'init': self.action_handler.initiative, 'pos': (self.e_x, self.e_y),
+                                          'revision': revision}
 
     def gen_walls(self):
         c.iso_strip(self.walls)
         self.walls = []
 
+        visible = self.game_view.map_handler.map.vision_handler.visible_mask().T.tolist()
         for node in self.path_finding_data[-2]:
-            if (self.game_view.map_handler.map.vision_handler.vision_image is not None and
-                    self.game_view.map_handler.map.vision_handler.vision_image.getpixel(node.location)[0]):
+            if visible[node.location[0]][node.location[1]]:
                 if self.path_finding_data[1][node] <= self.action_handler.initiative:
                     for index, neighbor in enumerate(node.neighbours):
                         neighbor_to_node = (index + 2) % 4
@@ -0,0 +1,142 @@
+import hashlib
+
+import numpy as np
+
+from vision_cpu import VISION_RADIUS, cast_visions, radius_window
+
+# Goes up whenever the way the sets are baked changes, so the old files are baked again.
+PVS_VERSION = 2
+
+# How many tiles are cast together when baking. More is faster but uses more memory.
+BAKE_BATCH = 256
+
+
+def pvs_location(location: str) -> str:
+    # The baked sets are kept next to the tmx map.
+    return f"tiled/tilemaps/{location}.pvs.npz"
+
+
+def walls_hash(walls: np.ndarray) -> str:
+    # Tells if the walls a file was baked from are the same as the walls of the map now.
+    return hashlib.sha1(str(walls.shape).encode() + walls.tobytes()).hexdigest()
+
+
+class VisibleSets:
+    """
+    The potentially visible set of every walkable tile on an unlit map. Every tile has the window around it that its
+    vision covers, a packed bitset of the tiles in that window it can see, and the distance channel of the window so a
+    lookup doesn't have to work the distances out again. They are baked from the walls the map
+    loaded with, so they are only right until a door changes. A tile whose window holds a wall that is different to
+    when it was baked isn't answered, and its vision has to be cast.
+    """
+
+    def __init__(self, walls: np.ndarray, tiles, windows, offsets, bits, distances):
+        """
+        :param walls: the walls the sets were baked from.
+        :param tiles: the flat y * width + x index of every baked tile.
+        :param windows: the (x, y, width, height) window of every baked tile.
+        :param offsets: where the bits of each tile start in bits. One longer than tiles.
+        :param bits: the packed bits of every tile one after the other.
+        :param distances: the green channel of every tile's window one after the other, 0 outside the vision radius.
+        """
+        self.height, self.width = walls.shape[:2]
+        self.walls = walls.copy()
+        self.windows = windows
+        self.offsets = offsets
+        self.bits = bits
+        self.distances = distances
+
+        # Where the distances of each tile start in distances.
+        self.distance_offsets = np.zeros(len(windows) + 1, np.int64)
+        np.cumsum(windows[:, 2] * windows[:, 3], out=self.distance_offsets[1:])
+
+        # The row of each tile in the arrays, or -1 if it wasn't baked.
+        self.rows = np.full(self.width * self.height, -1, np.int64)
+        self.rows[tiles] = np.arange(len(tiles))
+
+        # The tiles whose walls aren't the same as when the sets were baked.
+        self.changed = np.zeros((self.height, self.width), bool)
+
+        # How many visions were found from the sets, and how many had to be cast.
+        self.hits = 0
+        self.misses = 0
+
+    def modify(self, x, y, walls: np.ndarray):
+        """
+        Called when the walls of a tile change. When a door shuts again it goes back to how it was baked.
+        :param walls: the walls of the whole map.
+        """
+        self.changed[y, x] = (walls[y, x] != self.walls[y, x]).any()
+
+    def vision(self, x, y):
+        """
+        Find the vision of a tile from its bitset, the same as cast_vision would give for its window.
+        :return: the window and its vision, or None if the tile wasn't baked or a wall near it has changed.
+        """
+        row = self.rows[y * self.width + x]
+        if row < 0:
+            self.misses += 1
+            return None
+
+        window = tuple(self.windows[row].tolist())
+        window_x, window_y, window_width, window_height = window
+        if self.changed[window_y:window_y+window_height, window_x:window_x+window_width].any():
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        size = window_width * window_height
+        vision = np.empty((window_height, window_width, 4), np.uint8)
+        vision[:, :, 0] = np.unpackbits(self.bits[self.offsets[row]:self.offsets[row+1]],
+                                        count=size).reshape(window_height, window_width) * np.uint8(255)
+        start = self.distance_offsets[row]
+        vision[:, :, 1] = self.distances[start:start+size].reshape(window_height, window_width)
+
+        # Every tile has the blue and alpha of OUTSIDE, and the tiles outside the radius are 0 in red and green.
+        vision[:, :, 2:] = 255
+        return window, vision
+
+    def save(self, location: str):
+        np.savez_compressed(location, version=PVS_VERSION, radius=VISION_RADIUS, walls_hash=walls_hash(self.walls),
+                            tiles=np.flatnonzero(self.rows >= 0), windows=self.windows, offsets=self.offsets,
+                            bits=self.bits, distances=self.distances)
+
+
+def bake_sets(walls: np.ndarray, walkable: np.ndarray) -> VisibleSets:
+    """
+    Cast the vision of every walkable tile and pack what each can see.
+    :param walls: the wall map, see VisionCalculator.walls.
+    :param walkable: whether each tile can be stood on, in the y * width + x order of the PathGrid.
+    """
+    height, width = walls.shape[:2]
+    tiles = np.flatnonzero(walkable)
+    casters = [(tile % width, tile // width) for tile in tiles.tolist()]
+    windows = [radius_window(x, y, width, height) for x, y in casters]
+
+    packed, distances = [], []
+    for start in range(0, len(casters), BAKE_BATCH):
+        visions = cast_visions(walls, casters[start:start+BAKE_BATCH], False, windows[start:start+BAKE_BATCH])
+        packed.extend(np.packbits(vision[:, :, 0] > 0) for vision in visions)
+        distances.extend(vision[:, :, 1].ravel() for vision in visions)
+
+    offsets = np.zeros(len(tiles) + 1, np.int64)
+    offsets[1:] = np.cumsum([len(bits) for bits in packed])
+    bits = np.concatenate(packed) if packed else np.zeros(0, np.uint8)
+    distances = np.concatenate(distances) if distances else np.zeros(0, np.uint8)
+    return VisibleSets(walls, tiles, np.array(windows, np.int64).reshape(-1, 4), offsets, bits, distances)
+
+
+def load_sets(location: str, walls: np.ndarray):
+    """
+    Load the baked sets of a map.
+    :return: the sets, or None if there is no file or it was baked from different walls.
+    """
+    try:
+        with np.load(location) as data:
+            if (int(data['version']) != PVS_VERSION or int(data['radius']) != VISION_RADIUS or
+                    str(data['walls_hash']) != walls_hash(walls)):
+                return None
+            return VisibleSets(walls, data['tiles'], data['windows'], data['offsets'], data['bits'],
+                               data['distances'])
+    except (OSError, KeyError, ValueError):
+        return None
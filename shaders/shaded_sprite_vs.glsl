@@ -0,0 +1,32 @@
+#version 330
+
+// arcade's sprite list vertex shader, except the pieces of the map's tiles are tinted by the shading texture.
+// A piece's depth holds the y * width + x index of its tile plus one, and every other sprite has a depth of 0. The depth
+// isn't used for depth testing, so it is flattened once it is read. See Map.shade_tile.
+uniform sampler2D shading;
+
+in vec4 in_pos;
+in vec2 in_size;
+in float in_texture;
+in vec4 in_color;
+
+out float v_angle;
+out vec4 v_color;
+out vec2 v_size;
+out float v_texture;
+
+void main() {
+    gl_Position = vec4(in_pos.xy, 0.0, 1.0);
+    v_angle = in_pos.w;
+    v_color = in_color;
+
+    int index = int(round(in_pos.z)) - 1;
+    if (index >= 0)
+    {
+        int width = textureSize(shading, 0).x;
+        v_color *= texelFetch(shading, ivec2(index % width, index / width), 0);
+    }
+
+    v_size = in_size;
+    v_texture = in_texture;
+}
@@ -3,6 +3,8 @@
 uniform sampler2D vision_map;
 uniform vec4 cast_pos_resolution;
 uniform bool lit;
+// The x, y, width, and height of the part of the map being drawn to. The viewport is set to the same.
+uniform ivec4 window;
 
 float one_step = 1/cast_pos_resolution.z;
 
@@ -136,15 +138,14 @@ float point_cast(ivec2 start_point, ivec2 cast_point)
 
 void main()
 {
-    vec2 cast_pos = (cast_pos_resolution.xy + vec2(1))/cast_pos_resolution.zw;
-    ivec2 pos = ivec2(frag_uv*cast_pos_resolution.zw);
+    ivec2 pos = window.xy + ivec2(frag_uv*window.zw);
 
     vec2 cast_pos_square = (cast_pos_resolution.xy) * one_step;
     vec2 pos_square = pos * one_step;
     float dist = distance(cast_pos_square, pos_square);
     if (dist < 15/cast_pos_resolution.z || lit)
     {
-        frag_color = vec4(point_cast(ivec2(frag_uv*cast_pos_resolution.zw), ivec2(cast_pos_resolution.xy)), dist, 1, 1);
+        frag_color = vec4(point_cast(pos, ivec2(cast_pos_resolution.xy)), dist, 1, 1);
     }
     else
     {
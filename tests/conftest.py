@@ -0,0 +1,72 @@
+"""
+The tests run on the synthetic maps of benchmarks/maps.py, which have real Tiles but don't need arcade or a window.
+"""
+import numpy as np
+import pytest
+
+import algorithms
+from benchmarks.maps import GENERATORS, BenchMap
+
+SIZE = 40
+
+
+@pytest.fixture(params=sorted(GENERATORS))
+def bench(request) -> BenchMap:
+    """
+    A BenchMap of every kind of synthetic map, with its PathGrid made like Map.load_map makes it.
+    """
+    bench = BenchMap(GENERATORS[request.param](SIZE, SIZE))
+    algorithms.find_neighbours(bench.tile_map)
+    bench.path_grid = algorithms.PathGrid(bench.tile_map)
+    return bench
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+def walk_distances(path_grid, start):
+    """
+    How many steps every tile is from a tile with a plain breadth first search over the mask, -1 if it can't be
+    reached. What every search is checked against.
+    """
+    distances = np.full(path_grid.size, -1)
+    distances[start] = 0
+    frontier = [start]
+    for current in frontier:
+        for dir_dex, offset in enumerate(path_grid.offsets):
+            neighbour = current + offset
+            if path_grid.mask[current] >> dir_dex & 1 and distances[neighbour] < 0:
+                distances[neighbour] = distances[current] + 1
+                frontier.append(neighbour)
+    return distances
+
+
+def toggle_tile(bench, rng):
+    """
+    Open or close a random direction of a random tile, or take away or give back its move action, like a door.
+    :return: the changed tile.
+    """
+    tiles = [tile for tile in bench.tile_map.ravel() if tile is not None]
+    tile = tiles[rng.integers(len(tiles))]
+    if rng.random() < 0.25:
+        if 'move' in tile.available_actions:
+            tile.available_actions.pop('move')
+        else:
+            tile.available_actions['move'] = []
+    else:
+        dir_dex = int(rng.integers(4))
+        tile.directions[dir_dex] = 1 - tile.directions[dir_dex]
+    bench.update_tile(tile)
+    return tile
+
+
+@pytest.fixture
+def distances():
+    return walk_distances
+
+
+@pytest.fixture
+def toggle():
+    return toggle_tile
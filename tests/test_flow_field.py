@@ -0,0 +1,62 @@
+import numpy as np
+
+import algorithms
+from flow_field import FlowField
+
+
+def distances_from(path_grid, xy, blocked=()):
+    # How many steps every tile is from a tile, walking the reverse graph so it is how far each tile has to go to get
+    # there. -1 if it can't, or if it would have to go through a blocked tile.
+    blocked = set(blocked)
+    distances = np.full(path_grid.size, -1)
+    reverse_end, reverse_adjacency = path_grid.graph(reverse=True)
+    start = path_grid.index(xy)
+    distances[start] = 0
+    frontier = [start]
+    while frontier:
+        current = frontier.pop(0)
+        for neighbour in reverse_adjacency[4 * current:reverse_end[current]]:
+            if distances[neighbour] < 0 and neighbour not in blocked:
+                distances[neighbour] = distances[current] + 1
+                frontier.append(neighbour)
+    return distances
+
+
+def check_field(bench, seen_tiles=()):
+    path_grid = bench.path_grid
+    player = bench.game_view.player
+    initiative = player.action_handler.initiative
+
+    seen = algorithms.seen_map(bench).astype(np.int64)
+    seen[[path_grid.index(xy) for xy in seen_tiles]] = 255
+    goal_cost = algorithms.cost_map(bench, 'target_player') - algorithms.seen_map(bench) + seen
+
+    field = FlowField(path_grid)
+    field.update(goal_cost, seen, 0)
+
+    # The bots that can sneak up to the player without being seen have to head in. The others might be better off
+    # staying where they are.
+    distances = distances_from(path_grid, (player.e_x, player.e_y), np.flatnonzero(seen).tolist())
+    far = np.flatnonzero(distances > initiative)
+    assert len(far)
+    for start in far.tolist():
+        start_xy = path_grid.location(start)
+        path = field.path(start_xy, initiative)
+        assert path, start_xy
+
+        # The cost of the field goes down with every step, and the whole way leads somewhere better than the start.
+        current = start
+        for tile in field.path(start_xy, path_grid.size):
+            following = path_grid.index(tile.location)
+            assert field.cost[following] < field.cost[current]
+            current = following
+        assert goal_cost[current] < goal_cost[start]
+
+
+def test_far_bots_head_in(bench):
+    check_field(bench)
+
+
+def test_far_bots_head_in_while_seen(bench):
+    # A band of tiles across the map that the player can see.
+    check_field(bench, [(x, y) for x in range(bench.map_size[0]) for y in range(8, 11)])
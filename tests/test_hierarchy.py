@@ -0,0 +1,69 @@
+import algorithms
+from hierarchy import Hierarchy
+
+
+def pairs(bench, rng, count=40):
+    # Random pairs of walkable tiles, so both close and far goals are tried.
+    tiles = [tile.location for tile in bench.tile_map.ravel() if tile is not None and 'move' in tile.available_actions]
+    return [(tiles[first], tiles[second]) for first, second in rng.integers(len(tiles), size=(count, 2)).tolist()]
+
+
+def check_path(path_grid, start_xy, goal_xy, path):
+    # Every step has to be a move the PathGrid allows, and the path has to end on the goal.
+    adjacency_end, adjacency = path_grid.graph()
+    current = path_grid.index(start_xy)
+    for tile in path:
+        index = path_grid.index(tile.location)
+        assert index in adjacency[4 * current:adjacency_end[current]]
+        current = index
+    assert current == path_grid.index(goal_xy)
+
+
+def test_find_path_is_shortest(bench, rng, toggle, distances):
+    path_grid = bench.path_grid
+    for _ in range(20):
+        toggle(bench, rng)
+    for start_xy, goal_xy in pairs(bench, rng):
+        steps = distances(path_grid, path_grid.index(start_xy))[path_grid.index(goal_xy)]
+        path = algorithms.find_path(path_grid, start_xy, goal_xy, 30)
+        if 0 < steps <= 30:
+            check_path(path_grid, start_xy, goal_xy, path)
+            assert len(path) == steps
+        else:
+            assert path == []
+
+
+def test_hierarchy_reaches_what_a_search_does(bench, rng, toggle, distances):
+    path_grid = bench.path_grid
+    hierarchy = Hierarchy(path_grid)
+    for _ in range(4):
+        for _ in range(15):
+            toggle(bench, rng)
+        for start_xy, goal_xy in pairs(bench, rng, 20):
+            steps = distances(path_grid, path_grid.index(start_xy))[path_grid.index(goal_xy)]
+            path = hierarchy.find_path(start_xy, goal_xy)
+            if steps > 0:
+                # The path doesn't have to be the shortest, only a real one.
+                check_path(path_grid, start_xy, goal_xy, path)
+                assert len(path) >= steps
+                assert hierarchy.find_path(start_xy, goal_xy, 5) == path[:5]
+            else:
+                assert path == []
+
+
+def test_refresh_matches_a_new_hierarchy(bench, rng, toggle):
+    path_grid = bench.path_grid
+    hierarchy = Hierarchy(path_grid)
+    for toggles in (1, 10, algorithms.PathGrid.MAX_CHANGES + 1):
+        for _ in range(toggles):
+            toggle(bench, rng)
+        hierarchy.refresh()
+        fresh = Hierarchy(path_grid)
+        assert hierarchy.mask == fresh.mask == path_grid.mask.tolist()
+        assert {key: sorted(border) for key, border in hierarchy.borders.items()} == \
+            {key: sorted(border) for key, border in fresh.borders.items()}
+        assert {key: set(crossing) for key, crossing in hierarchy.crossings.items() if crossing} == \
+            {key: set(crossing) for key, crossing in fresh.crossings.items() if crossing}
+        for key, cluster in fresh.clusters.items():
+            assert hierarchy.clusters[key].entrances == cluster.entrances
+            assert hierarchy.clusters[key].edges == cluster.edges
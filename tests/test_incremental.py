@@ -0,0 +1,49 @@
+import pytest
+
+import algorithms
+
+
+def field_costs(field):
+    return dict(zip(field.reached.tolist(), field.cost_so_far.tolist()))
+
+
+def check_field(field, fresh):
+    # The costs have to match, the parents only have to lead to the tile a step earlier.
+    assert field_costs(field) == field_costs(fresh)
+    assert int(field.reached[0]) == int(fresh.reached[0])
+    costs = field_costs(field)
+    adjacency_end, adjacency = field.path_grid.graph()
+    for index, parent in zip(field.reached.tolist()[1:], field.came_from.tolist()[1:]):
+        assert index in adjacency[4 * parent:adjacency_end[parent]] and costs[parent] == costs[index] - 1
+
+
+@pytest.mark.parametrize('toggles', [1, 10, 40])
+def test_repair_matches_a_fresh_field(bench, rng, toggle, toggles):
+    path_grid = bench.path_grid
+    player = bench.game_view.player
+    start_xy = player.e_x, player.e_y
+    search = algorithms.IncrementalPath.from_field(algorithms.path_field(path_grid, start_xy, 15))
+    for _ in range(8):
+        for _ in range(toggles):
+            toggle(bench, rng)
+        check_field(search.compute(), algorithms.path_field(path_grid, start_xy, 15))
+
+
+def test_repair_after_the_changes_are_gone(bench, rng, toggle):
+    path_grid = bench.path_grid
+    search = algorithms.IncrementalPath(path_grid, (1, 1), 20)
+    search.compute()
+    for _ in range(algorithms.PathGrid.MAX_CHANGES + 1):
+        toggle(bench, rng)
+    assert path_grid.changed_since(search.version) is None
+    check_field(search.compute(), algorithms.path_field(path_grid, (1, 1), 20))
+
+
+def test_growing_the_search(bench, rng, toggle):
+    path_grid = bench.path_grid
+    player = bench.game_view.player
+    start_xy = player.e_x, player.e_y
+    search = algorithms.IncrementalPath(path_grid, start_xy, 5)
+    for max_dist in (5, 12, 25):
+        toggle(bench, rng)
+        check_field(search.compute(max_dist), algorithms.path_field(path_grid, start_xy, max_dist))
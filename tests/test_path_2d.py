@@ -0,0 +1,54 @@
+import pytest
+
+import algorithms
+
+
+def starts(bench, count=6):
+    # The player's tile and a spread of the other walkable tiles.
+    tiles = [tile for tile in bench.tile_map.ravel() if tile is not None and 'move' in tile.available_actions]
+    player = bench.game_view.player
+    return [(player.e_x, player.e_y)] + [tiles[index].location for index in range(0, len(tiles), len(tiles) // count)]
+
+
+def has_wall(path_grid, tile, reached) -> bool:
+    # Whether gen_walls would draw a wall on any side of the tile.
+    bits = path_grid.mask[path_grid.index(tile.location)]
+    return any(not bits >> dir_dex & 1 or neighbour not in reached for dir_dex, neighbour in enumerate(tile.neighbours))
+
+
+@pytest.mark.parametrize('algorithm', sorted(algorithms.COST_FUNCTIONS))
+@pytest.mark.parametrize('max_dist', [0, 5, 20])
+def test_path_2d_array_matches_path_2d(bench, rng, toggle, distances, algorithm, max_dist):
+    path_grid = bench.path_grid
+    for _ in range(20):
+        toggle(bench, rng)
+    adjacency_end, adjacency = path_grid.graph()
+
+    for start_xy in starts(bench):
+        came_from, cost_so_far, edges, tile_costs = algorithms.path_2d(bench.tile_map, start_xy, max_dist, algorithm)
+        array_came, array_cost, array_edges, array_costs = algorithms.path_2d_array(path_grid, start_xy, max_dist,
+                                                                                     algorithm)
+        assert array_cost == cost_so_far
+        if algorithm == 'base':
+            steps = distances(path_grid, path_grid.index(start_xy))
+            assert cost_so_far == {tile: int(steps[path_grid.index(tile.location)]) for tile in path_grid.tiles
+                                   if tile is not None and 0 <= steps[path_grid.index(tile.location)] <= max_dist}
+
+        # Where two tiles could lead to the same tile the searches can pick different ones, both as good.
+        assert array_came.keys() == came_from.keys()
+        for tile, parent in array_came.items():
+            if parent is None:
+                assert tile.location == start_xy
+                continue
+            index, parent_index = path_grid.index(tile.location), path_grid.index(parent.location)
+            assert index in adjacency[4 * parent_index:adjacency_end[parent_index]]
+            assert cost_so_far[parent] == cost_so_far[tile] - 1
+
+        # path_2d marks more tiles as edges than it needs to, the extra ones don't have a side for gen_walls to draw.
+        assert set(array_edges) == {tile for tile in cost_so_far if has_wall(path_grid, tile, cost_so_far)}
+        assert set(array_edges) <= set(edges)
+        assert [cost_so_far[tile] for tile in array_edges] == sorted(cost_so_far[tile] for tile in array_edges)
+
+        def by_tile(item):
+            return item[0], item[1].location
+        assert sorted(array_costs.elements, key=by_tile) == sorted(tile_costs.elements, key=by_tile)
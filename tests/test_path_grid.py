@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+import algorithms
+
+
+def check_same(path_grid):
+    # A grid that has been patched has to be the same as one built from scratch from its directions and walkable.
+    fresh = algorithms.PathGrid(np.empty((path_grid.width, path_grid.height), object))
+    fresh.directions, fresh.walkable = path_grid.directions.copy(), path_grid.walkable.copy()
+    fresh.build_mask()
+    assert (path_grid.mask == fresh.mask).all()
+    assert (path_grid.reverse_mask == fresh.reverse_mask).all()
+    for reverse in (False, True):
+        ends, adjacency = path_grid.graph(reverse)
+        fresh_ends, fresh_adjacency = fresh.graph(reverse)
+        arrays = (path_grid.reverse_end, path_grid.reverse_adjacency) if reverse else \
+            (path_grid.adjacency_end, path_grid.adjacency)
+        assert ends == fresh_ends == arrays[0].tolist()
+        # The slots past the end of a row aren't read, so only the rows are compared.
+        for index in range(path_grid.size):
+            row = fresh_adjacency[4 * index:fresh_ends[index]]
+            assert adjacency[4 * index:ends[index]] == row == arrays[1][4 * index:ends[index]].tolist()
+
+
+def test_update_tile_patches_the_graph(bench, rng, toggle):
+    path_grid = bench.path_grid
+    # Make the list copies first so they are patched as well.
+    path_grid.graph(), path_grid.graph(reverse=True)
+    for _ in range(60):
+        toggle(bench, rng)
+    check_same(path_grid)
+
+
+@pytest.mark.parametrize('box', [(0, 0, 5, 5), (10, 12, 16, 16), (33, 30, 7, 10), (0, 20, 40, 1)])
+def test_update_region_patches_the_graph(bench, rng, box):
+    path_grid = bench.path_grid
+    path_grid.graph(), path_grid.graph(reverse=True)
+    x, y, width, height = box
+    grid = (path_grid.height, path_grid.width)
+    path_grid.directions.reshape(grid)[y:y+height, x:x+width] = rng.integers(0, 16, (height, width))
+    path_grid.walkable.reshape(grid)[y:y+height, x:x+width] = rng.random((height, width)) < 0.8
+    version = path_grid.version
+    path_grid.update_region(x, y, width, height)
+    check_same(path_grid)
+    assert path_grid.version == version + width * height
+
+
+def test_changed_since(bench, rng, toggle):
+    path_grid = bench.path_grid
+    version = path_grid.version
+    changed = {path_grid.index(toggle(bench, rng).location) for _ in range(10)}
+    assert path_grid.changed_since(version) == changed
+    assert path_grid.changed_since(path_grid.version) == set()
+
+    # Once the changes are too old to be kept there is nothing to repair from.
+    for _ in range(algorithms.PathGrid.MAX_CHANGES + 1):
+        toggle(bench, rng)
+    assert path_grid.changed_since(version) is None
+    assert len(path_grid.changes) <= algorithms.PathGrid.MAX_CHANGES
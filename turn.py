@@ -98,11 +98,17 @@ class MoveAction(Action):
         """
         Finds the shortest path based on the input location.
         """
-        self.handler.actor.load_paths()
-        path = algorithms.reconstruct_path(self.actor.path_finding_grid,
-                                           self.actor.path_finding_data[0],
-                                           (self.actor.e_x, self.actor.e_y),
-                                           (self.inputs[0].e_x, self.inputs[0].e_y))[:self.handler.initiative]
+        start = self.actor.path_finding_grid[self.actor.e_x, self.actor.e_y]
+        if self.actor.algorithm == 'base' and start is not None and start.map.path_grid is not None:
+            # Only the one tile matters, so there is no need to search the whole area the actor can reach.
+            path = algorithms.find_path(start.map.path_grid, (self.actor.e_x, self.actor.e_y),
+                                        (self.inputs[0].e_x, self.inputs[0].e_y), self.handler.initiative)
+        else:
+            self.handler.actor.load_paths()
+            path = algorithms.reconstruct_path(self.actor.path_finding_grid,
+                                               self.actor.path_finding_data[0],
+                                               (self.actor.e_x, self.actor.e_y),
+                                               (self.inputs[0].e_x, self.inputs[0].e_y))[:self.handler.initiative]
         self.data['path'] = path
         self.find_cost()
 
@@ -150,6 +156,14 @@ class MoveEAction(Action):
     def setup(self):
         target = (c.clamp(c.PLAYER.e_x + random.choice((-2, -1, 1, 2)), 0, c.CURRENT_MAP_SIZE[0]-1),
                   c.clamp(c.PLAYER.e_y + random.choice((-2, -1, 1, -2)), 0, c.CURRENT_MAP_SIZE[1]-1))
+
+        start = self.actor.path_finding_grid[self.actor.e_x, self.actor.e_y]
+        if self.actor.algorithm == 'target_player' and start is not None and start.map.flow_field is not None:
+            # All the bots hunting the player follow the same flow field rather than searching for themselves.
+            self.data['path'] = start.map.flow_path((self.actor.e_x, self.actor.e_y), self.handler.initiative, target)
+            self.find_cost()
+            return
+
         self.actor.load_paths()
         came_from = self.actor.path_finding_data[0]
 
@@ -284,7 +298,7 @@ class ShootAction(Action):
         if (self.actor not in self.inputs and self.cost <= self.handler.initiative and
                (self.actor.e_x != self.inputs[0].e_x or self.actor.e_y != self.inputs[0].e_y) and
                 self.handler.turn_handler.game_view.map_handler.map.vision_handler.
-                        vision_image.getpixel((self.actor.e_x, self.actor.e_y))[0]):
+                        is_visible(self.actor.e_x, self.actor.e_y)):
             return True
         return False
 
@@ -300,15 +300,19 @@ class GameView(arcade.View):
                             self.window.view_y, self.window.view_y + c.SCREEN_HEIGHT)
 
     def on_draw(self):
-        self.map_handler.map.vision_handler.draw_prep()
+        vision_handler = self.map_handler.map.vision_handler
+        vision_handler.draw_prep()
         arcade.start_render()
 
+        vision_handler.use_shading(c.GROUND_LIST)
         c.GROUND_LIST.draw()
 
         # Middle Shaders Between floor and other isometric sprites
         if self.map_handler is not None:
             self.map_handler.draw()
 
+        # hide_walls can run in map_handler.draw, so the shading is bound again after it.
+        vision_handler.use_shading(c.ISO_LIST)
         c.ISO_LIST.draw()
 
         self.turn_handler.on_draw()
@@ -369,6 +373,8 @@ class GameView(arcade.View):
                 self.motion_start = time.time()
                 self.motion = True
 
+        self.map_handler.update_world()
+
         self.player.update_animation(delta_time)
         for sprite in self.map_handler.map.animated_sprites:
             sprite.update_animation(delta_time)
@@ -1,34 +1,91 @@
-from PIL import Image
+from collections import deque
+
+import numpy as np
+from pyglet import gl as pyglet_gl
 
 import arcade
 import arcade.gl as gl
 
 import constants
+import pvs
+from vision_cache import VisionCache
+from vision_cpu import OUTSIDE, cast_vision, cast_visions, radius_window
 
 
 class VisionCalculator:
 
-    def __init__(self, context: arcade.Window, caster, lit=False):
+    def __init__(self, context: arcade.Window, caster, lit=False, backend=None):
         """
         The vision calculator uses shaders to rapidly do a ray cast to every tile within a certain radius.
         this is then used to show the player what they can see.
-        :param context: the game window
+        :param context: the game window. Can be None with the 'cpu' backend, then the vision is never drawn.
         :param caster: the caster. in this case the player.
         :param lit: whether the map is lit up or not. If it isn't lit up then there is a drop of in the light.
+        :param backend: 'gl' to cast with the shader or 'cpu' to cast with numpy (vision_cpu.py). Both give the same
+        vision. Defaults to constants.VISION_BACKEND.
         """
         self.ctx = context
         self.caster = caster
+        self.lit = lit
+        self.backend = backend or constants.VISION_BACKEND
         self.map_size = (0, 0)
 
         self.regenerate = True
         self.recalculate = 2
 
-        self.map_image: Image.Image = None
+        # The box of the wall map changed since it was last sent to the map texture, as [left, bottom, right, top].
+        # Every change in a frame is sent at once.
+        self.dirty = None
+
+        # The vision revision goes up by one every time the vision is calculated, the wall one when the walls change.
+        self.revision = 0
+        self.wall_revision = 0
+
+        # The past visions, so stepping back onto a tile doesn't cast again. Its hits and misses are for tuning.
+        self.vision_cache = VisionCache(constants.VISION_CACHE_BUDGET)
+
+        # The baked vision of every walkable tile, see pvs.py. None until the map is baked, and for lit maps.
+        self.visible_sets: pvs.VisibleSets = None
+
+        # The vision of the other actors watching the map, like the bots. Each actor has the (e_x, e_y, wall_revision)
+        # its vision was found at, the (x, y, width, height) window it covers, and the vision of that window.
+        self.observers = {}
+
         self.map_texture = None
         self.vision_texture = None
-        self.vision_image: Image.Image = None
         self.buffer = None
 
+        # How every tile of the map is shaded, written by Map.hide_walls. The pieces of the tiles are tinted by their
+        # tile in it when they are drawn, see use_shading.
+        self.shading_texture = None
+
+        # The last finished vision, shape (height, width, 4) so it is indexed [y, x]. Red is 255 if the tile can be
+        # seen and green is the distance to the caster divided by the map width. Only the window around the caster is
+        # cast and read back each time, and it is copied into this. Use the query methods below rather than reading it.
+        self.vision: np.ndarray = None
+
+        # The (x, y, width, height) part of the map last put into vision, the part last drawn to the vision texture,
+        # and the part a lit map is cast over.
+        self.vision_window = None
+        self.drawn_window = None
+        self.lit_window = None
+
+        # The two pixel buffers the vision is read back into. While the gpu fills one the last finished vision stays
+        # in vision. pending holds the buffers still being filled, oldest first, and fences says when each is done.
+        self.pixel_buffers = []
+        self.fences = [None, None]
+        self.windows = [None, None]
+        self.keys = [None, None]
+        self.pending = deque()
+        self.next_buffer = 0
+
+        # The wall map, shape (height, width, 4). Channel i is 255 if the tile is open in direction i of c.DIRECTIONS.
+        self.walls: np.ndarray = None
+
+        if context is None:
+            self.geometry = None
+            return
+
         # The shader that calculates the vision
         self.geometry = gl.geometry.screen_rectangle(-1, -1, 2, 2)
         self.vision_program = context.ctx.load_program(
@@ -43,43 +100,484 @@ class VisionCalculator:
         )
         self.draw_tiles_program['lit'] = lit
 
-    def setup(self, map_size):
-        self.map_size = map_size
-        self.map_image = Image.new("RGBA", map_size)
+        # arcade's sprite list program, but the pieces of the tiles are coloured by the shading texture.
+        self.shading_program = context.ctx.load_program(
+            vertex_shader="shaders/shaded_sprite_vs.glsl",
+            geometry_shader=":system:shaders/sprites/sprite_list_geometry_cull_geo.glsl",
+            fragment_shader=":system:shaders/sprites/sprite_list_geometry_fs.glsl"
+        )
+        self.shading_program['sprite_texture'] = 0
+        self.shading_program['uv_texture'] = 1
+        self.shading_program['shading'] = 2
+
+    def setup(self, map_size, textures=True):
+        """
+        Get ready for a new map.
+        :param map_size: the width and height of the map.
+        :param textures: whether to make the textures now. They need the main thread, so a map prepared on a worker
+        thread makes them later with create_textures.
+        """
+        self.map_size = tuple(map_size)
+        self.walls = np.zeros((map_size[1], map_size[0], 4), np.uint8)
+        self.dirty = None
+        self.regenerate = True
+        self.wall_revision += 1
+        self.observers = {}
+        self.visible_sets = None
+        self.vision = None
+        self.vision_window = None
+        if textures:
+            self.create_textures()
+
+    def create_textures(self):
+        # Make the textures and buffers of the map. All of the walls are sent to the map texture the next frame.
+        if self.ctx is None:
+            return
+        map_size = self.map_size
+        self.regenerate = True
         self.vision_texture = self.ctx.ctx.texture(map_size, filter=(gl.NEAREST, gl.NEAREST),
                                                    wrap_x=gl.CLAMP_TO_BORDER,
                                                    wrap_y=gl.CLAMP_TO_BORDER)
 
         self.buffer = self.ctx.ctx.framebuffer(color_attachments=self.vision_texture)
+        self.buffer.clear(color=OUTSIDE)
+
+        # The wall map texture lives as long as the map does. Changes are written into it, see update_walls.
+        self.map_texture = self.ctx.ctx.texture(map_size, filter=(gl.NEAREST, gl.NEAREST))
+        self.shading_texture = self.ctx.ctx.texture(map_size, filter=(gl.NEAREST, gl.NEAREST))
+        self.drawn_window = None
+
+        # The last map's vision is the wrong size, so the first vision of this map has to be waited for.
+        self.vision = None
+        self.vision_window = None
+        self.drop_readbacks()
+        self.pixel_buffers = [self.ctx.ctx.buffer(reserve=map_size[0] * map_size[1] * 4, usage="stream")
+                              for _ in range(2)]
 
     def modify_map(self, pos, data):
+        """
+        Change the walls of one tile. The change is sent to the gpu with the rest of the frame's changes.
+        :param pos: the x and y position of the tile.
+        :param data: whether the tile is open in each direction.
+        """
+        x, y = pos
+        self.walls[y, x] = [255 * open_side for open_side in data]
+        self.wall_revision += 1
+        if self.visible_sets is not None:
+            self.visible_sets.modify(x, y, self.walls)
+        if self.dirty is None:
+            self.dirty = [x, y, x + 1, y + 1]
+        else:
+            self.dirty = [min(self.dirty[0], x), min(self.dirty[1], y),
+                          max(self.dirty[2], x + 1), max(self.dirty[3], y + 1)]
+
+    def set_walls(self, walls):
+        """
+        Replace the whole wall map at once, like when a compiled map is loaded. All of it is sent to the map texture.
+        :param walls: the new wall map, see walls.
+        """
+        self.walls[:] = walls
+        self.wall_revision += 1
+        if self.visible_sets is not None:
+            self.visible_sets.changed[:] = (self.walls != self.visible_sets.walls).any(axis=2)
+        self.dirty = None
         self.regenerate = True
-        self.map_image.putpixel(pos, tuple((255*x for x in data)))
 
-    def calculate(self):
+    def update_walls(self):
+        """
+        Send the changed part of the wall map to the map texture, or all of it if the whole map has to be
+        regenerated. Opening a door only writes the one tile.
+        """
         if self.regenerate:
-            self.map_texture = self.ctx.ctx.texture(self.map_size, data=self.map_image.tobytes(),
-                                                    filter=(gl.NEAREST, gl.NEAREST))
-            self.regenerate = False
+            window = (0, 0, *self.map_size)
+            self.find_lit_window()
+        elif self.dirty is not None:
+            left, bottom, right, top = self.dirty
+            window = (left, bottom, right - left, top - bottom)
+            self.find_lit_window(window)
+        else:
+            return
+
+        self.regenerate = False
+        self.dirty = None
+        if self.map_texture is not None:
+            x, y, width, height = window
+            self.map_texture.write(np.ascontiguousarray(self.walls[y:y+height, x:x+width]).tobytes(), viewport=window)
+
+    def write_shading(self, window, shading):
+        """
+        Send the shading of part of the map to the shading texture, so every tile a step changes is one write.
+        :param window: the (x, y, width, height) part of the map.
+        :param shading: the colour and alpha of every tile in the window, shape (height, width, 4).
+        """
+        if self.shading_texture is not None:
+            self.shading_texture.write(np.ascontiguousarray(shading, np.uint8).tobytes(), viewport=window)
+
+    def use_shading(self, sprite_list):
+        """
+        Draw a sprite list with the shading of this map. Called right before the list is drawn.
+        """
+        if self.shading_texture is None or not len(sprite_list):
+            return
+        sprite_list.initialize()
+        sprite_list.data.program = self.shading_program
+        self.shading_texture.use(2)
+
+    def bake(self, location, walkable):
+        """
+        Load the baked visible sets of the map, or bake and save them if they are missing or were baked from other
+        walls. Lit maps aren't baked, they can see any distance so the sets would grow with the map.
+        :param location: the name of the tmx map.
+        :param walkable: whether each tile can be stood on, in the y * width + x order of the PathGrid.
+        """
+        self.visible_sets = None
+        if self.lit:
+            return
 
+        location = pvs.pvs_location(location)
+        visible_sets = pvs.load_sets(location, self.walls)
+        if visible_sets is None:
+            visible_sets = pvs.bake_sets(self.walls, walkable)
+            try:
+                visible_sets.save(location)
+            except OSError:
+                # It can still be used until the map is loaded again.
+                pass
+        self.visible_sets = visible_sets
+
+    def calculate(self):
+        key = (self.caster.e_x, self.caster.e_y, self.wall_revision, self.lit)
+        found = self.vision_cache.get(key)
+        if found is None and self.visible_sets is not None:
+            found = self.visible_sets.vision(self.caster.e_x, self.caster.e_y)
+            if found is not None:
+                self.vision_cache.put(key, *found)
+
+        if found is not None:
+            # Any readback still running is older than this.
+            self.update_walls()
+            self.drop_readbacks()
+            self.show_vision(*found)
+            return
+
+        if self.backend == 'cpu':
+            self.calculate_cpu(key)
+            return
+
+        self.update_walls()
+        window = self.find_window(self.caster.e_x, self.caster.e_y)
         self.buffer.use()
-        self.buffer.clear()
         arcade.set_viewport(0, self.map_size[0], 0, self.map_size[1])
+        # Only the last window can have anything in it, the rest of the texture is still cleared from setup.
+        if self.drawn_window is not None and self.drawn_window != window:
+            self.buffer.clear(color=OUTSIDE, viewport=self.drawn_window)
+        self.buffer.viewport = window
+        self.drawn_window = window
+
         self.map_texture.use(0)
         self.vision_program['cast_pos_resolution'] = self.caster.e_x, self.caster.e_y, *self.map_size
+        self.vision_program['window'] = window
         self.geometry.render(self.vision_program)
+        self.start_readback(window, key)
+
+        self.buffer.viewport = (0, 0, *self.map_size)
         self.ctx.use()
         arcade.set_viewport(self.ctx.view_x, self.ctx.view_x+constants.SCREEN_WIDTH,
                             self.ctx.view_y, self.ctx.view_y+constants.SCREEN_HEIGHT)
-        self.vision_image = Image.frombytes("RGBA", self.map_size, bytes(self.vision_texture.read()))
+
+    def find_window(self, x, y):
+        """
+        The part of the map that has to be cast. For an unlit map it is the box around the vision radius, so the cost
+        of the vision doesn't grow with the map. A lit map can see any distance, so it is the box around every tile
+        that has an open side. Anything outside that is blocked before it can reach the caster.
+        :param x: the x position of the caster.
+        :param y: the y position of the caster.
+        :return: the window as (x, y, width, height).
+        """
+        if self.lit:
+            left, bottom, right, top = self.lit_window or (x, y, x + 1, y + 1)
+            if self.dirty is not None:
+                # Changes that haven't been sent yet could have opened tiles outside the box.
+                left, bottom = min(left, self.dirty[0]), min(bottom, self.dirty[1])
+                right, top = max(right, self.dirty[2]), max(top, self.dirty[3])
+            left, bottom, right, top = min(left, x), min(bottom, y), max(right, x + 1), max(top, y + 1)
+        else:
+            return radius_window(x, y, *self.map_size)
+        return left, bottom, right - left, top - bottom
+
+    def find_lit_window(self, window=None):
+        """
+        Find the box around every tile with an open side, as (left, bottom, right, top). With a window the box only
+        grows to hold the open tiles in it. It doesn't shrink when a door shuts, but a bigger box casts the same.
+        :param window: the (x, y, width, height) part of the wall map that changed. The whole map if None.
+        """
+        x, y, width, height = window or (0, 0, *self.map_size)
+        if window is None:
+            self.lit_window = None
+
+        open_y, open_x = np.nonzero(self.walls[y:y+height, x:x+width].any(axis=2))
+        if not len(open_x):
+            return
+        left, bottom = x + int(open_x.min()), y + int(open_y.min())
+        right, top = x + int(open_x.max()) + 1, y + int(open_y.max()) + 1
+        if self.lit_window is not None:
+            left, bottom = min(left, self.lit_window[0]), min(bottom, self.lit_window[1])
+            right, top = max(right, self.lit_window[2]), max(top, self.lit_window[3])
+        self.lit_window = left, bottom, right, top
+
+    def merge_window(self, window, data):
+        """
+        Put the vision of a window into the full map vision. The last window is reset first, since anything it could
+        see and the new one doesn't cover is now out of range.
+        :param window: the (x, y, width, height) the data covers.
+        :param data: the vision of the window, shape (height, width, 4).
+        """
+        if self.vision is None:
+            self.vision = np.empty((self.map_size[1], self.map_size[0], 4), np.uint8)
+            self.vision[:] = OUTSIDE
+        elif self.vision_window is not None:
+            x, y, width, height = self.vision_window
+            self.vision[y:y+height, x:x+width] = OUTSIDE
+
+        x, y, width, height = window
+        self.vision[y:y+height, x:x+width] = data
+        self.vision_window = window
+
+    def start_readback(self, window, key):
+        """
+        Copy the window of the vision framebuffer into the next pixel buffer. This only queues the copy on the gpu, so
+        it doesn't wait for the vision to finish rendering. collect_readback picks the result up once it is done.
+        :param window: the (x, y, width, height) window that was rendered.
+        :param key: the key of the vision in the vision cache.
+        """
+        index = self.next_buffer
+        self.next_buffer = 1 - index
+        if self.fences[index] is not None:
+            # The buffer is still being filled with an older vision. The one about to be read is newer anyway.
+            pyglet_gl.glDeleteSync(self.fences[index])
+            self.fences[index] = None
+            self.pending.remove(index)
+
+        pyglet_gl.glPixelStorei(pyglet_gl.GL_PACK_ALIGNMENT, 1)
+        pyglet_gl.glBindBuffer(pyglet_gl.GL_PIXEL_PACK_BUFFER, self.pixel_buffers[index].glo)
+        pyglet_gl.glReadPixels(*window, pyglet_gl.GL_RGBA, pyglet_gl.GL_UNSIGNED_BYTE, None)
+        pyglet_gl.glBindBuffer(pyglet_gl.GL_PIXEL_PACK_BUFFER, 0)
+
+        self.fences[index] = pyglet_gl.glFenceSync(pyglet_gl.GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        self.windows[index] = window
+        self.keys[index] = key
+        self.pending.append(index)
+
+    def collect_readback(self, wait=False) -> bool:
+        """
+        Check if any of the pixel buffers have finished, and if they have make the newest one the vision.
+        :param wait: block until every pending buffer is done.
+        :return: whether there is a new vision.
+        """
+        finished = None
+        while self.pending:
+            index = self.pending[0]
+            status = pyglet_gl.glClientWaitSync(self.fences[index], pyglet_gl.GL_SYNC_FLUSH_COMMANDS_BIT,
+                                                1_000_000_000 if wait else 0)
+            if status not in (pyglet_gl.GL_ALREADY_SIGNALED, pyglet_gl.GL_CONDITION_SATISFIED):
+                break
+            pyglet_gl.glDeleteSync(self.fences[index])
+            self.fences[index] = None
+            finished = self.pending.popleft()
+
+        if finished is None:
+            return False
+
+        window = self.windows[finished]
+        data = self.pixel_buffers[finished].read(window[2] * window[3] * 4)
+        vision = np.frombuffer(data, np.uint8).reshape(window[3], window[2], 4)
+        self.vision_cache.put(self.keys[finished], window, vision)
+        self.merge_window(window, vision)
+        self.revision += 1
+        return True
+
+    def release(self):
+        """
+        Let go of the textures and arrays of the map while it is unloaded, see Map.unload. setup makes them again.
+        """
+        self.drop_readbacks()
+        for gl_object in (self.buffer, self.vision_texture, self.map_texture, self.shading_texture,
+                          *self.pixel_buffers):
+            if gl_object is not None:
+                gl_object.delete()
+        self.buffer = self.vision_texture = self.map_texture = self.shading_texture = None
+        self.pixel_buffers = []
+        self.walls = None
+        self.vision = None
+        self.vision_window = None
+        self.drawn_window = None
+        self.observers = {}
+        self.visible_sets = None
+        self.vision_cache.clear()
+
+    def footprint(self) -> int:
+        """
+        :return: the rough number of bytes the vision of the map uses, on the cpu and the gpu.
+        """
+        if self.walls is None:
+            return 0
+        width, height = self.map_size
+        size = self.walls.nbytes + self.vision_cache.used
+        if self.vision is not None:
+            size += self.vision.nbytes
+        if self.visible_sets is not None:
+            sets = self.visible_sets
+            size += sets.bits.nbytes + sets.distances.nbytes + sets.rows.nbytes + sets.walls.nbytes
+        if self.vision_texture is not None:
+            # The vision, wall, and shading textures and the two pixel buffers.
+            size += 5 * width * height * 4
+        return size
+
+    def drop_readbacks(self):
+        # Forget the readbacks that haven't finished, like when a new map is loaded.
+        for index in self.pending:
+            pyglet_gl.glDeleteSync(self.fences[index])
+            self.fences[index] = None
+        self.pending.clear()
+
+    def calculate_cpu(self, key):
+        """
+        Find the vision with numpy instead of the shader. If there is a window the vision is still put into the
+        vision texture so it can be drawn.
+        :param key: the key of the vision in the vision cache.
+        """
+        self.update_walls()
+        window = self.find_window(self.caster.e_x, self.caster.e_y)
+        vision = cast_vision(self.walls, (self.caster.e_x, self.caster.e_y), self.lit, window)
+        self.vision_cache.put(key, window, vision)
+        self.show_vision(window, vision)
+
+    def show_vision(self, window, data):
+        """
+        Use a vision found on the cpu, from casting or from the baked sets. It is merged into the vision, and written
+        into the vision texture if there is one.
+        :param window: the (x, y, width, height) the data covers.
+        :param data: the vision of the window, shape (height, width, 4).
+        """
+        self.merge_window(window, data)
+        if self.vision_texture is not None:
+            # Write the box around the old and the new window, so the old one is cleared on the texture as well.
+            x, y, width, height = window
+            right, top = x + width, y + height
+            last_window = self.drawn_window
+            if last_window is not None:
+                x, y = min(x, last_window[0]), min(y, last_window[1])
+                right, top = max(right, last_window[0] + last_window[2]), max(top, last_window[1] + last_window[3])
+            self.vision_texture.write(np.ascontiguousarray(self.vision[y:top, x:right]).tobytes(),
+                                      viewport=(x, y, right - x, top - y))
+            self.drawn_window = window
+        self.revision += 1
+
+    def visible_mask(self, window=None) -> np.ndarray:
+        """
+        :param window: only the (x, y, width, height) part of the map. The whole map if None.
+        :return: whether each tile can be seen, shape (height, width) so it is indexed [y, x]. Nothing can be seen
+        before the first vision has finished.
+        """
+        x, y, width, height = window or (0, 0, *self.map_size)
+        if self.vision is None:
+            return np.zeros((height, width), bool)
+        return self.vision[y:y+height, x:x+width, 0] > 0
+
+    def distance_field(self, window=None) -> np.ndarray:
+        """
+        :param window: only the (x, y, width, height) part of the map. The whole map if None.
+        :return: the distance of each tile to the caster in tiles, shape (height, width). Only the tiles inside the
+        vision radius have a distance, the rest are 0.
+        """
+        x, y, width, height = window or (0, 0, *self.map_size)
+        if self.vision is None:
+            return np.zeros((height, width))
+        return self.vision[y:y+height, x:x+width, 1] * (self.map_size[0] / 255)
+
+    def is_visible(self, xs, ys):
+        """
+        Whether the tiles at xs, ys can be seen.
+        :param xs: an x position or an array of them.
+        :param ys: a y position or an array of them, the same shape as xs.
+        :return: a bool for a single tile, or a bool array the same shape as xs.
+        """
+        if self.vision is None:
+            return np.zeros(np.shape(xs), bool) if np.ndim(xs) else False
+        visible = self.vision[ys, xs, 0] > 0
+        return bool(visible) if np.ndim(visible) == 0 else visible
+
+    def observe(self, actors):
+        """
+        Find the vision of every actor watching the map, all in one batch on the cpu. Only the actors that have moved,
+        or that were watching when the walls changed, are cast again. Any actor not given stops watching.
+        :param actors: the actors watching, like the bots.
+        """
+        observers = {}
+        stale = []
+        for actor in actors:
+            sight = self.observers.get(actor)
+            if sight is not None and sight[0] == (actor.e_x, actor.e_y, self.wall_revision):
+                observers[actor] = sight
+            else:
+                stale.append(actor)
+
+        if self.visible_sets is not None:
+            casting = []
+            for actor in stale:
+                baked = self.visible_sets.vision(actor.e_x, actor.e_y)
+                if baked is None:
+                    casting.append(actor)
+                else:
+                    observers[actor] = ((actor.e_x, actor.e_y, self.wall_revision), *baked)
+            stale = casting
+
+        if stale:
+            windows = [self.find_window(actor.e_x, actor.e_y) for actor in stale]
+            visions = cast_visions(self.walls, [(actor.e_x, actor.e_y) for actor in stale], self.lit, windows)
+            for actor, window, vision in zip(stale, windows, visions):
+                observers[actor] = ((actor.e_x, actor.e_y, self.wall_revision), window, vision)
+        self.observers = observers
+
+    def can_see(self, actor, xs, ys):
+        """
+        Whether an actor given to observe can see the tiles at xs, ys.
+        :param actor: the watching actor.
+        :param xs: an x position or an array of them.
+        :param ys: a y position or an array of them, the same shape as xs.
+        :return: a bool for a single tile, or a bool array the same shape as xs.
+        """
+        sight = self.observers.get(actor)
+        if sight is None:
+            return np.zeros(np.shape(xs), bool) if np.ndim(xs) else False
+
+        key, (x, y, width, height), vision = sight
+        xs, ys = np.asarray(xs) - x, np.asarray(ys) - y
+        inside = (0 <= xs) & (xs < width) & (0 <= ys) & (ys < height)
+        visible = inside & (vision[np.clip(ys, 0, height - 1), np.clip(xs, 0, width - 1), 0] > 0)
+        return bool(visible) if np.ndim(visible) == 0 else visible
 
     def draw_prep(self):
-        if self.recalculate or self.regenerate:
+        """
+        Called before each frame is drawn. Starts a new vision if the caster or the map has changed, and sets
+        recalculate to 1 once there is a new vision so the map knows to update what it shows.
+
+        With the 'gl' backend the vision arrives a frame or so after it is started, and until then the last vision is
+        still used. The only time it is waited for is when there is no vision yet.
+        """
+        revision = self.revision
+        if self.recalculate or self.regenerate or self.dirty is not None:
             self.calculate()
+            self.recalculate = 0
+
+        if self.backend == 'gl':
+            self.collect_readback(wait=self.vision is None)
+
+        if self.revision != revision:
             self.recalculate = 1
 
     def draw(self):
-        if self.map_texture is not None:
+        if self.vision_texture is not None and self.vision is not None:
             self.vision_texture.use()
             self.draw_tiles_program['screen_pos_resolution'] = [self.ctx.view_x, self.ctx.view_y, *self.map_size]
             self.geometry.render(self.draw_tiles_program)
@@ -0,0 +1,76 @@
+from collections import OrderedDict
+
+
+class VisionCache:
+    """
+    The vision cache holds the past visions of one map so the player stepping back and forth between a few tiles
+    doesn't have to cast again. Every vision is keyed on (caster x, caster y, wall revision, lit), and the least
+    recently used visions are thrown away once the cache goes over its memory budget.
+    """
+
+    def __init__(self, budget: int):
+        """
+        :param budget: The rough number of bytes the cached visions can use.
+        """
+        self.budget = budget
+        self.used = 0
+
+        # The wall revision the visions are from. When the walls change every vision is out of date.
+        self.revision = -1
+
+        # Each vision is its (x, y, width, height) window and the vision of that window.
+        self.visions: OrderedDict[tuple, tuple] = OrderedDict()
+
+        # For tuning the budget.
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.visions.clear()
+        self.used = 0
+
+    def check_revision(self, revision):
+        # Throw away every vision from before the walls changed.
+        if revision != self.revision:
+            self.clear()
+            self.revision = revision
+
+    def get(self, key):
+        """
+        :param key: (caster x, caster y, wall revision, lit).
+        :return: the window and its vision, or None if it isn't cached.
+        """
+        self.check_revision(key[2])
+        vision = self.visions.get(key)
+        if vision is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.visions.move_to_end(key)
+        return vision
+
+    def put(self, key, window, vision):
+        """
+        :param key: (caster x, caster y, wall revision, lit).
+        :param window: the (x, y, width, height) window the vision covers.
+        :param vision: the vision of the window. It is kept as is, so it mustn't be changed afterwards.
+        """
+        if key[2] < self.revision:
+            # A readback that started before the walls last changed.
+            return
+
+        self.check_revision(key[2])
+        size = vision.nbytes
+        if key in self.visions or size > self.budget:
+            return
+
+        self.visions[key] = (window, vision)
+        self.used += size
+        while self.used > self.budget:
+            self.evict()
+
+    def evict(self):
+        # remove the least recently used vision.
+        key, (window, vision) = self.visions.popitem(last=False)
+        self.used -= vision.nbytes
@@ -0,0 +1,167 @@
+import numpy as np
+
+# How far the caster can see when the map isn't lit, in tiles. The same as vision_frag.glsl.
+VISION_RADIUS = 15
+
+# What the shader gives a tile outside of the vision radius.
+OUTSIDE = (0, 0, 255, 255)
+
+
+def cast_vision(walls: np.ndarray, caster_xy, lit=False, window=None) -> np.ndarray:
+    """
+    The vision shader (shaders/vision_frag.glsl) run on the cpu with numpy, so vision can be found without a GL context.
+
+    Like the shader a line is walked from every tile to the caster, one step along x or y at a time, and the tile can't
+    be seen if any step goes through a wall. Every tile is walked at once, so there is only one python loop per step
+    of the longest line.
+
+    :param walls: the wall map in the same layout as VisionCalculator.walls, shape (height, width, 4). Channel i is
+    255 if the tile is open in direction i of c.DIRECTIONS.
+    :param caster_xy: the x and y position of the caster.
+    :param lit: whether the map is lit up. If it isn't then only the tiles within VISION_RADIUS are cast.
+    :param window: only cast the tiles in this (x, y, width, height) part of the map. It has to hold the caster.
+    :return: the vision in the same layout the shader renders, shape (height, width, 4) of the window or of the whole
+    map. Red is 255 if the tile can be seen, green is the distance to the caster divided by the map width.
+    """
+    return cast_visions(walls, [caster_xy], lit, [window])[0]
+
+
+def cast_visions(walls: np.ndarray, casters, lit=False, windows=None) -> list:
+    """
+    Find the vision of many casters at once. The lines of every caster are walked together, so the python loop runs
+    once for the longest line of any of them instead of once per caster.
+
+    This walks the shader's lines rather than doing recursive symmetric shadowcasting. Shadowcasting sweeps whole arcs
+    of tiles, so it disagrees with the shader's one-step-at-a-time lines on the tiles near corners, door frames and
+    pillars. It is also symmetric, a tile sees the caster exactly when the caster sees it, which the shader's lines
+    aren't. So symmetric shadowcasting would change what bots see: can_see and ShootAction would let a bot spot and
+    shoot the player from tiles it can't on the gl backend, and the other way round. Matching the shader line for line
+    keeps the cpu, gl and pvs backends giving the same tiles, so the game plays the same with or without a GL context
+    and benchmarks/vision.py can check each backend against the others.
+    :param walls: the wall map, see cast_vision.
+    :param casters: the x and y position of each caster.
+    :param lit: whether the map is lit up.
+    :param windows: the (x, y, width, height) window of each caster, or None for the whole map.
+    :return: the vision of each caster, the same as cast_vision would give.
+    """
+    height, width = walls.shape[:2]
+    windows = windows or [None] * len(casters)
+    is_open = walls >= 255
+
+    visions, insides, distances = [], [], []
+    targets_x, targets_y, casters_x, casters_y = [], [], [], []
+    for (caster_x, caster_y), window in zip(casters, windows):
+        window_x, window_y, window_width, window_height = window = window or (0, 0, width, height)
+        distance, inside = window_distance(width, (caster_x, caster_y), window, lit)
+
+        # Every line stays in the box around its tile and the caster, so it never leaves the window.
+        inside_y, inside_x = np.nonzero(inside)
+        targets_x.append(inside_x + window_x)
+        targets_y.append(inside_y + window_y)
+        casters_x.append(np.full(len(inside_x), caster_x))
+        casters_y.append(np.full(len(inside_x), caster_y))
+        insides.append((inside_y, inside_x))
+        distances.append(distance)
+
+        vision = np.empty((window_height, window_width, 4), np.uint8)
+        vision[:] = OUTSIDE
+        visions.append(vision)
+
+    if not visions:
+        return visions
+
+    hit = cast_lines(is_open, np.concatenate(targets_x), np.concatenate(targets_y),
+                     np.concatenate(casters_x), np.concatenate(casters_y))
+
+    start = 0
+    for vision, (inside_y, inside_x), distance in zip(visions, insides, distances):
+        end = start + len(inside_x)
+        vision[inside_y, inside_x, 0] = np.where(hit[start:end], 0, 255)
+        vision[inside_y, inside_x, 1] = np.rint(np.clip(distance[inside_y, inside_x], 0, 1) * 255)
+        start = end
+    return visions
+
+
+def radius_window(x, y, width, height):
+    """
+    The box of tiles around a caster that an unlit vision can reach, one more than the radius so the distance check
+    decides the edge.
+    :param x: the x position of the caster.
+    :param y: the y position of the caster.
+    :param width: the width of the map.
+    :param height: the height of the map.
+    :return: the window as (x, y, width, height).
+    """
+    left, bottom = max(x - VISION_RADIUS, 0), max(y - VISION_RADIUS, 0)
+    right, top = min(x + VISION_RADIUS + 1, width), min(y + VISION_RADIUS + 1, height)
+    return left, bottom, right - left, top - bottom
+
+
+def window_distance(width, caster_xy, window, lit=False):
+    """
+    The distance of every tile in a window to the caster, and whether it is close enough to be cast.
+    :param width: the width of the map. The distances are divided by it, like the shader.
+    :param caster_xy: the x and y position of the caster.
+    :param window: the (x, y, width, height) part of the map.
+    :param lit: whether the map is lit up. Then every tile is cast.
+    :return: the distances and the tiles to cast, both shape (height, width) of the window.
+    """
+    window_x, window_y, window_width, window_height = window
+    caster_x, caster_y = caster_xy
+
+    # The shader works in 32 bit floats, so the distances and the step choices have to as well to match it.
+    one_step = np.float32(1) / np.float32(width)
+    grid_y, grid_x = np.mgrid[window_y:window_y+window_height, window_x:window_x+window_width]
+    distance = np.sqrt((np.float32(caster_x) * one_step - grid_x.astype(np.float32) * one_step) ** 2 +
+                       (np.float32(caster_y) * one_step - grid_y.astype(np.float32) * one_step) ** 2)
+    if lit:
+        inside = np.ones((window_height, window_width), bool)
+    else:
+        inside = distance < np.float32(VISION_RADIUS) / np.float32(width)
+    return distance, inside
+
+
+def cast_lines(is_open: np.ndarray, target_x, target_y, caster_x, caster_y) -> np.ndarray:
+    """
+    Walk a line from each target to its caster the same way the shader does.
+    :param is_open: whether each tile is open in each direction, shape (height, width, 4).
+    :return: whether each line went through a wall.
+    """
+    point_x, point_y = target_x.copy(), target_y.copy()
+    delta_x, delta_y = caster_x - target_x, caster_y - target_y
+    length_x, length_y = np.abs(delta_x), np.abs(delta_y)
+    float_x, float_y = length_x.astype(np.float32), length_y.astype(np.float32)
+    step_x, step_y = np.where(delta_x > 0, 1, -1), np.where(delta_y > 0, 1, -1)
+
+    # The wall channel to leave a tile through and to enter the next one through, along each axis.
+    x_out, x_in = np.where(step_x > 0, 1, 3), np.where(step_x > 0, 3, 1)
+    y_out, y_in = np.where(step_y > 0, 0, 2), np.where(step_y > 0, 2, 0)
+
+    moved_x = np.zeros(len(target_x), np.int64)
+    moved_y = np.zeros(len(target_x), np.int64)
+    hit = np.zeros(len(target_x), bool)
+
+    # A line straight along one axis divides by 0, which is the same inf the shader gets.
+    with np.errstate(divide='ignore'):
+        while True:
+            active = (moved_x < length_x) | (moved_y < length_y)
+            if not active.any():
+                break
+
+            along_x = active & ((np.float32(0.5) + moved_x) / float_x < (np.float32(0.5) + moved_y) / float_y)
+            along_y = active & ~along_x
+
+            # Leave the current tile.
+            hit |= along_x & ~is_open[point_y, point_x, x_out]
+            hit |= along_y & ~is_open[point_y, point_x, y_out]
+
+            point_x = point_x + along_x * step_x
+            point_y = point_y + along_y * step_y
+            moved_x += along_x
+            moved_y += along_y
+
+            # Enter the next one.
+            hit |= along_x & ~is_open[point_y, point_x, x_in]
+            hit |= along_y & ~is_open[point_y, point_x, y_in]
+
+    return hit
@@ -0,0 +1,338 @@
+import json
+import os
+import xml.etree.ElementTree as ElementTree
+
+import numpy as np
+
+import algorithms
+import constants as c
+import isometric
+import map_cache
+from vision_cpu import cast_vision, radius_window
+
+# The layers whose sprites a chunk makes by itself. The doors, gates, points of interest, and characters need the data
+# of their map in map_data.json, so they stay with mapdata.Map.
+SPRITE_LAYERS = ('floor', 'wall', 'decoration')
+
+
+def read_placements(location: str) -> dict:
+    """
+    Read where a tiled world file puts each map.
+    :param location: the world file.
+    :return: a dict of the name of each map to its (x, y) in tiles. Empty if there is no world file.
+    """
+    try:
+        with open(location) as file:
+            entries = json.load(file)['maps']
+    except (OSError, KeyError, ValueError):
+        return {}
+
+    placements = {}
+    for entry in entries:
+        # The world file is in pixels, so it is divided by the tile size of the map. The width and height in the world
+        # file aren't used as tiled doesn't always update them, the compiled map knows its real size.
+        path = os.path.join(os.path.dirname(location), entry['fileName'])
+        try:
+            root = ElementTree.parse(path).getroot()
+            tile_width, tile_height = int(root.get('tilewidth')), int(root.get('tileheight'))
+        except (OSError, ElementTree.ParseError, TypeError):
+            continue
+        name = os.path.splitext(os.path.basename(path))[0]
+        placements[name] = (entry['x'] // tile_width, entry['y'] // tile_height)
+    return placements
+
+
+class Chunk:
+    """
+    One square of the streaming world. It holds the tiles and walls of every map that overlaps it, copied out of the
+    compiled maps, and the sprites of the plain layers once they are made. Every array is indexed [x, y] from the
+    corner of the chunk.
+    """
+
+    def __init__(self, key, size):
+        """
+        :param key: the x and y of the chunk, in chunks.
+        :param size: the width and height of the chunk in tiles.
+        """
+        self.key = key
+        self.x, self.y = key[0] * size, key[1] * size
+        self.size = size
+
+        self.present = np.zeros((size, size), bool)
+        self.directions = np.zeros((size, size), np.uint8)
+        self.walls = np.zeros((size, size), np.uint8)
+        self.walkable = np.zeros((size, size), bool)
+
+        # Which tiles have been seen. Kept by the world when the chunk is unloaded, like Map.seen_tiles.
+        self.seen = np.zeros((size, size), bool)
+
+        # The (map name, layer name, world x, world y, tile value) of every cell in the chunk that holds something.
+        self.cells = []
+
+        # The sprites of each layer in SPRITE_LAYERS, only made if the world wants them.
+        self.sprites = {}
+
+    def copy_map(self, name, compiled: map_cache.CompiledMap, placement):
+        """
+        Copy the part of a compiled map that overlaps the chunk.
+        :param name: the name of the map.
+        :param compiled: the compiled map.
+        :param placement: where the map is in the world, in tiles.
+        """
+        map_x, map_y = placement
+        width, height = compiled.map_size
+
+        # The overlap in the map's own tiles.
+        left, top = max(self.x - map_x, 0), max(self.y - map_y, 0)
+        right, bottom = min(self.x + self.size - map_x, width), min(self.y + self.size - map_y, height)
+        if left >= right or top >= bottom:
+            return
+
+        region = (slice(left, right), slice(top, bottom))
+        offset_x, offset_y = map_x - self.x, map_y - self.y
+        target = (slice(left + offset_x, right + offset_x), slice(top + offset_y, bottom + offset_y))
+        present = compiled.present[region]
+        self.present[target] |= present
+        self.directions[target] = np.where(present, compiled.directions[region], self.directions[target])
+        self.walls[target] = np.where(present, compiled.walls[region], self.walls[target])
+        self.walkable[target] = np.where(present, compiled.walkable[region], self.walkable[target])
+
+        # The layer grids are indexed [e_y, e_x].
+        for layer, shown, grid in compiled.layers:
+            part = grid[top:bottom, left:right]
+            for (e_y, e_x), value in zip(np.argwhere(part).tolist(), part[part != 0].tolist()):
+                self.cells.append((name, layer, e_x + left + map_x, e_y + top + map_y, value))
+
+    def build_sprites(self, frame):
+        """
+        Make the sprites of the plain layers, cast as if they were tiles of one map past its edges. The cells of that
+        map are left out as the map makes their sprites itself.
+        :param frame: the name of the map, where it is in the world, and its size.
+        """
+        frame_name, (origin_x, origin_y), map_size = frame
+        isometric.CASTING.map_size = map_size
+        try:
+            for name, layer, x, y, value in self.cells:
+                if layer in SPRITE_LAYERS and name != frame_name:
+                    data = str(value) if layer == 'decoration' else value
+                    sprites = isometric.find_iso_sprites(data, (x - origin_x, y - origin_y))
+                    self.sprites.setdefault(layer, []).extend(sprites)
+        finally:
+            isometric.CASTING.map_size = None
+
+    def footprint(self) -> int:
+        # The rough number of bytes the chunk uses while it is loaded, guessed the same way as Map.footprint.
+        sprites = sum(len(layer) for layer in self.sprites.values())
+        return self.size * self.size * 6 + len(self.cells) * 64 + sprites * 2048
+
+
+class World:
+    """
+    The streaming world places the compiled maps of a tiled world file in one grid of tiles and cuts it into chunks of
+    c.CHUNK_SIZE. Only the chunks around the player and the camera are loaded. The loaded chunks are stitched into one
+    window with a single PathGrid and wall map, so paths and vision cross the borders of the chunks and the maps the
+    same as they cross any other tile.
+
+    The window is bigger than the loaded chunks, so a chunk being loaded or unloaded only copies that chunk in or out
+    and patches the PathGrid around it. It is only placed again once a chunk is loaded outside of it.
+    """
+
+    def __init__(self, maps: dict, location: str, size=c.CHUNK_SIZE, radius=c.CHUNK_RADIUS, frame=None):
+        """
+        :param maps: the compiled map of each map name. Maps in the world file that aren't given are left out.
+        :param location: the world file.
+        :param size: the width and height of each chunk in tiles.
+        :param radius: how many chunks around each centre are loaded. Chunks are only unloaded once they are one
+        further than that, so walking back and forth over the edge of a chunk doesn't load it again every step.
+        :param frame: the name of the map the chunks make the sprites of their plain layers around, see
+        Chunk.build_sprites. If it is None, or the map isn't in the world, no sprites are made.
+        """
+        self.size = size
+        self.radius = radius
+
+        placements = read_placements(location)
+        self.maps = {name: (maps[name], placement) for name, placement in placements.items() if maps.get(name)}
+
+        # Tiled lets maps go left of or above the origin, so everything is moved to start at 0, 0.
+        if self.maps:
+            left = min(x for compiled, (x, y) in self.maps.values())
+            top = min(y for compiled, (x, y) in self.maps.values())
+            self.maps = {name: (compiled, (x - left, y - top)) for name, (compiled, (x, y)) in self.maps.items()}
+            self.world_size = (max(x + compiled.map_size[0] for compiled, (x, y) in self.maps.values()),
+                               max(y + compiled.map_size[1] for compiled, (x, y) in self.maps.values()))
+        else:
+            self.world_size = (0, 0)
+        self.chunk_count = (-(-self.world_size[0] // size), -(-self.world_size[1] // size))
+
+        self.frame = None
+        if frame in self.maps:
+            compiled, placement = self.maps[frame]
+            self.frame = (frame, placement, compiled.map_size)
+
+        # The loaded chunks by their key, and the seen tiles of the chunks that have been unloaded.
+        self.chunks = {}
+        self.seen = {}
+
+        # The (x, y, width, height) in tiles of the window the loaded chunks are stitched together in. walls is in the
+        # layout of VisionCalculator.walls and the PathGrid has the world (x, y) of every tile in place of a Tile, so
+        # find_path gives world positions. The parts of the window without a loaded chunk have no tiles.
+        self.window = (0, 0, 0, 0)
+        self.walls: np.ndarray = None
+        self.path_grid: algorithms.PathGrid = None
+
+    def chunk_of(self, x, y):
+        return x // self.size, y // self.size
+
+    def around(self, centres, radius) -> set:
+        # The keys of every chunk in the world within radius chunks of any of the centres.
+        keys = set()
+        for x, y in centres:
+            chunk_x, chunk_y = self.chunk_of(x, y)
+            for key_x in range(max(chunk_x - radius, 0), min(chunk_x + radius + 1, self.chunk_count[0])):
+                for key_y in range(max(chunk_y - radius, 0), min(chunk_y + radius + 1, self.chunk_count[1])):
+                    keys.add((key_x, key_y))
+        return keys
+
+    def update(self, *centres):
+        """
+        Load the chunks around the centres and unload the ones that are far away, then stitch the loaded chunks
+        together again if anything changed.
+        :param centres: the world (x, y) of the player, the tile at the centre of the camera, and so on.
+        :return: the chunks that were loaded and the chunks that were unloaded, so their sprites can be added to and
+        taken out of the sprite lists.
+        """
+        wanted = self.around(centres, self.radius)
+        kept = self.around(centres, self.radius + 1)
+
+        loaded = [self.load_chunk(key) for key in sorted(wanted - self.chunks.keys())]
+        unloaded = [self.unload_chunk(key) for key in sorted(self.chunks.keys() - kept)]
+        if loaded or unloaded:
+            self.stitch(loaded, unloaded)
+        return loaded, unloaded
+
+    def placement(self, name):
+        # Where a map is in the world, in tiles.
+        return self.maps[name][1]
+
+    def load_chunk(self, key) -> Chunk:
+        chunk = Chunk(key, self.size)
+        for name, (compiled, placement) in self.maps.items():
+            chunk.copy_map(name, compiled, placement)
+        if key in self.seen:
+            chunk.seen = self.seen.pop(key)
+        if self.frame is not None:
+            chunk.build_sprites(self.frame)
+        self.chunks[key] = chunk
+        return chunk
+
+    def unload_chunk(self, key) -> Chunk:
+        chunk = self.chunks.pop(key)
+        if chunk.seen.any():
+            self.seen[key] = chunk.seen
+        return chunk
+
+    def stitch(self, loaded, unloaded):
+        """
+        Copy the chunks that were loaded into the window and clear the ones that were unloaded.
+        :param loaded: the chunks that were loaded.
+        :param unloaded: the chunks that were unloaded.
+        """
+        if not self.chunks:
+            self.window = (0, 0, 0, 0)
+            self.walls = self.path_grid = None
+        elif self.path_grid is None or not all(self.in_window(chunk) for chunk in loaded):
+            self.place_window()
+        else:
+            for chunk in unloaded:
+                if self.in_window(chunk):
+                    self.write_chunk(chunk, clear=True)
+            for chunk in loaded:
+                self.write_chunk(chunk)
+
+    def in_window(self, chunk) -> bool:
+        left, top, width, height = self.window
+        return (left <= chunk.x and chunk.x + self.size <= left + width and
+                top <= chunk.y and chunk.y + self.size <= top + height)
+
+    def place_window(self):
+        # Place the window around the loaded chunks with room for radius more chunks on every side, so the chunks
+        # loaded next usually fit in it, then copy every loaded chunk in.
+        keys_x, keys_y = [key[0] for key in self.chunks], [key[1] for key in self.chunks]
+        left, top = max(min(keys_x) - self.radius, 0) * self.size, max(min(keys_y) - self.radius, 0) * self.size
+        right = min(max(keys_x) + self.radius + 1, self.chunk_count[0]) * self.size
+        bottom = min(max(keys_y) + self.radius + 1, self.chunk_count[1]) * self.size
+        self.window = (left, top, right - left, bottom - top)
+
+        self.walls = np.zeros((bottom - top, right - left, 4), np.uint8)
+        # Like benchmarks/maps.py an empty tile_map gives a PathGrid with no tiles, and the arrays are filled in after.
+        self.path_grid = algorithms.PathGrid(np.empty((right - left, bottom - top), object))
+        self.path_grid.tiles[:] = [(x, y) for y in range(top, bottom) for x in range(left, right)]
+        for chunk in self.chunks.values():
+            self.write_chunk(chunk, patch=False)
+        self.path_grid.build_mask()
+
+    def write_chunk(self, chunk, clear=False, patch=True):
+        """
+        Copy a chunk into the window.
+        :param chunk: the chunk, which has to be inside the window.
+        :param clear: clear the chunk's part of the window instead, once it is unloaded.
+        :param patch: patch the PathGrid around the chunk. Not needed when the whole PathGrid is built after.
+        """
+        x, y = chunk.x - self.window[0], chunk.y - self.window[1]
+        block = (slice(y, y + self.size), slice(x, x + self.size))
+        grid = (self.path_grid.height, self.path_grid.width)
+        if clear:
+            self.walls[block] = 0
+            self.path_grid.directions.reshape(grid)[block] = 0
+            self.path_grid.walkable.reshape(grid)[block] = False
+        else:
+            self.walls[block] = map_cache.unpack_bits(chunk.walls).transpose(1, 0, 2) * np.uint8(255)
+            self.path_grid.directions.reshape(grid)[block] = np.where(chunk.present, chunk.directions, 0).T
+            self.path_grid.walkable.reshape(grid)[block] = chunk.walkable.T
+        if patch:
+            self.path_grid.update_region(x, y, self.size, self.size)
+
+    def loaded(self, x, y) -> bool:
+        return self.chunk_of(x, y) in self.chunks
+
+    def find_path(self, start_xy, goal_xy, max_dist: int = 20) -> list:
+        """
+        Find the path between two loaded tiles of the world, see algorithms.find_path.
+        :return: the world (x, y) of each tile to move through, not including the start. Empty if either tile isn't
+        loaded or the goal can't be reached.
+        """
+        if not (self.loaded(*start_xy) and self.loaded(*goal_xy)):
+            return []
+        left, top = self.window[:2]
+        return algorithms.find_path(self.path_grid, (start_xy[0] - left, start_xy[1] - top),
+                                    (goal_xy[0] - left, goal_xy[1] - top), max_dist)
+
+    def cast(self, caster_xy, lit=False):
+        """
+        Find what can be seen from a tile across all the loaded chunks, and mark the tiles that can be seen in their
+        chunks.
+        :param caster_xy: the world x and y of the caster. It has to be in a loaded chunk.
+        :param lit: whether the world is lit up. If it isn't only the box the vision radius reaches is cast.
+        :return: the world (x, y, width, height) box that was cast, and its vision, see vision_cpu.cast_vision. The
+        vision is indexed [y, x] from the corner of the box.
+        """
+        left, top, width, height = self.window
+        caster = (caster_xy[0] - left, caster_xy[1] - top)
+        window = None if lit else radius_window(*caster, width, height)
+        vision = cast_vision(self.walls, caster, lit, window)
+
+        x, y, width, height = window or (0, 0, width, height)
+        x, y = x + left, y + top
+        visible = vision[:, :, 0].T == 255
+        for chunk in self.chunks.values():
+            start_x, start_y = max(chunk.x, x), max(chunk.y, y)
+            end_x, end_y = min(chunk.x + self.size, x + width), min(chunk.y + self.size, y + height)
+            if start_x < end_x and start_y < end_y:
+                chunk.seen[start_x - chunk.x:end_x - chunk.x, start_y - chunk.y:end_y - chunk.y] |= \
+                    visible[start_x - x:end_x - x, start_y - y:end_y - y]
+        return (x, y, width, height), vision
+
+    def footprint(self) -> int:
+        # The rough number of bytes the loaded chunks and what is stitched from them use.
+        stitched = 0 if self.walls is None else self.walls.nbytes + self.path_grid.size * 16
+        return sum(chunk.footprint() for chunk in self.chunks.values()) + stitched